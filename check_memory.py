@@ -0,0 +1,31 @@
+import os
+
+# Runs without a window or audio device, the check only drives App.update and App.render
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from main import App
+
+
+# Five idle seconds with the mouse resting over the tableau
+RECORDING = "recordings/idle.rec"
+
+# Blocks an idle frame may allocate, a little above what idle frames allocate today
+IDLE_BUDGET = 32
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fail if idle frames allocate more than the budget.")
+    parser.add_argument("--recording", default=RECORDING, help="idle input recording to play back (default: %(default)s)")
+    parser.add_argument("--budget", type=int, default=IDLE_BUDGET, help="blocks an idle frame may allocate (default: %(default)s)")
+    args = parser.parse_args()
+
+    app = App(replay=args.recording, unthrottled=True, fast_start=True, idle_budget=args.budget)
+
+    if not app.memory_profile.passed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from game.archive import UNDO, decode_flags, read_games
+from game.rules import Board
+
+
+class GameSummary:
+    def __init__(self, seed) -> None:
+        self.seed = seed
+        self.valid = True
+        self.won = False
+        self.moves = 0
+        self.undos = 0
+        self.foundation_moves = Counter()
+
+    @property
+    def hardness(self):
+        """Lost games rank above won ones, then games with more moves played, then more undos."""
+        return (0 if self.won else 1, self.moves, self.undos)
+
+
+def replay_game(game:dict) -> GameSummary:
+    """Replays one archived game through the rules."""
+    summary = GameSummary(game["seed"])
+    board = Board()
+    board.new_game(game["seed"])
+    log = []
+
+    for event in game["events"]:
+        if event[0] == UNDO:
+            if len(log) > 0:
+                board.undo_move(*log.pop())
+            summary.undos += 1
+            continue
+
+        source_id, target_id, amount, flags, origin = event
+        flips = decode_flags(flags)
+
+        # Stock clicks are not validated by the game either, only check they are possible
+        if origin == "stock":
+            valid = len(board.piles[source_id]) > 0
+        else:
+            valid = board.validate_move(source_id, target_id, amount)
+
+        if not valid:
+            summary.valid = False
+            return summary
+
+        board.perform_move(source_id, target_id, amount, *flips)
+        log.append((source_id, target_id, amount, *flips))
+        summary.moves += 1
+
+        if 'foundation' in target_id:
+            summary.foundation_moves[origin] += 1
+
+    summary.won = board.is_won
+    return summary
+
+
+def replay_games(games:Iterable[dict]) -> Iterator[GameSummary]:
+    for game in games:
+        if game == None:
+            # Damaged in the archive, counted as invalid
+            summary = GameSummary(None)
+            summary.valid = False
+            yield summary
+        else:
+            yield replay_game(game)
+
+
+class Analysis:
+    """Fixed-size aggregates over any number of games.
+
+    Games are streamed through generators and only counters, histograms and the
+    top hardest seeds are kept, so memory does not grow with the archive size."""
+
+    def __init__(self, top = 10) -> None:
+        self.top = top
+        self.games = 0
+        self.wins = 0
+        self.invalid = 0
+        self.undos = 0
+        self.games_with_undo = 0
+        self.moves_to_win = Counter()
+        self.foundation_moves = Counter()
+
+        # Seed -> hardness of its hardest game, for the hardest seeds seen so far
+        self.hardest = {}
+
+    def add(self, summary:GameSummary):
+        if not summary.valid:
+            self.invalid += 1
+            return
+
+        self.games += 1
+        self.undos += summary.undos
+        self.games_with_undo += summary.undos > 0
+        self.foundation_moves.update(summary.foundation_moves)
+
+        if summary.won:
+            self.wins += 1
+            self.moves_to_win[summary.moves] += 1
+
+        self.add_hardest(summary.seed, summary.hardness)
+
+    def add_hardest(self, seed, hardness):
+        """Keeps the top hardest seeds. A seed played more than once ranks by its hardest game."""
+        if seed in self.hardest:
+            self.hardest[seed] = max(self.hardest[seed], hardness)
+        elif len(self.hardest) < self.top:
+            self.hardest[seed] = hardness
+        else:
+            easiest = min(self.hardest, key=self.hardest.get)
+            if hardness > self.hardest[easiest]:
+                del self.hardest[easiest]
+                self.hardest[seed] = hardness
+
+    def consume(self, summaries:Iterable[GameSummary]) -> "Analysis":
+        for summary in summaries:
+            self.add(summary)
+        return self
+
+    def merge(self, other:"Analysis") -> "Analysis":
+        self.games += other.games
+        self.wins += other.wins
+        self.invalid += other.invalid
+        self.undos += other.undos
+        self.games_with_undo += other.games_with_undo
+        self.moves_to_win.update(other.moves_to_win)
+        self.foundation_moves.update(other.foundation_moves)
+        for seed, hardness in other.hardest.items():
+            self.add_hardest(seed, hardness)
+        return self
+
+    def moves_to_win_percentile(self, fraction):
+        """Returns the move count below which the given fraction of won games fall."""
+        target = fraction * self.wins
+        seen = 0
+        for moves in sorted(self.moves_to_win):
+            seen += self.moves_to_win[moves]
+            if seen >= target:
+                return moves
+        return None
+
+    def report(self) -> str:
+        games = max(1, self.games)
+        lines = [
+            f"Games: {self.games} ({self.invalid} skipped, damaged or failed to replay)",
+            f"Win rate: {self.wins / games:.1%}",
+            f"Undos: {self.undos / games:.2f} per game, {self.games_with_undo / games:.1%} of games use undo",
+        ]
+
+        if self.wins > 0:
+            lines.append("Moves to win: p10 %s, median %s, p90 %s" % tuple(
+                self.moves_to_win_percentile(p) for p in (0.1, 0.5, 0.9)
+            ))
+
+        total = sum(self.foundation_moves.values())
+        if total > 0:
+            lines.append("Foundation moves by origin:")
+            for origin, count in self.foundation_moves.most_common():
+                lines.append(f"  {origin:<6} {count:10d} {count / total:6.1%}")
+
+        lines.append("Hardest deals:")
+        for seed, (lost, moves, undos) in sorted(self.hardest.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  seed {seed}: {'lost' if lost else 'won'} after {moves} moves and {undos} undos")
+
+        return "\n".join(lines)
+
+
+def analyze_file(path, top = 10) -> Analysis:
+    """Streams one archive file through the pipeline."""
+    return Analysis(top).consume(replay_games(read_games(path)))
+
+
+def analyze(paths, workers = None, top = 10) -> Analysis:
+    """Analyses archive files in parallel, one file per task, and merges the results."""
+    result = Analysis(top)
+
+    if workers == 1:
+        for path in paths:
+            result.merge(analyze_file(path, top))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for analysis in pool.map(analyze_file, paths, [top] * len(paths)):
+            result.merge(analysis)
+
+    return result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay and aggregate archived games.")
+    parser.add_argument("paths", nargs="+", metavar="ARCHIVE", help="archive files written with --archive")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--top", type=int, default=10, help="number of hardest deals to list")
+    args = parser.parse_args()
+
+    print(analyze(args.paths, args.workers, args.top).report())
+
+if __name__ == '__main__':
+    main()
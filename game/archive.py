@@ -0,0 +1,126 @@
+from typing import Iterator
+import gzip
+import json
+import zlib
+
+
+# Events are compact JSON lists. A move is [source_id, target_id, amount, flags, origin],
+# an undo of the last move is [UNDO].
+UNDO = "u"
+
+FLIP_SOURCE_TOP = 1
+FLIP_SOURCE_PILE = 2
+FLIP_TARGET_TOP = 4
+FLIP_TARGET_PILE = 8
+
+# Start of every gzip member, reading resumes at the next one after a damaged member
+GZIP_MAGIC = b"\x1f\x8b\x08"
+
+CHUNK_SIZE = 1 << 16
+
+
+def encode_move(source_id, target_id, amount, flip_source_top, flip_source_pile, flip_target_top, flip_target_pile, origin) -> list:
+    flags = (
+        (FLIP_SOURCE_TOP if flip_source_top else 0)
+        | (FLIP_SOURCE_PILE if flip_source_pile else 0)
+        | (FLIP_TARGET_TOP if flip_target_top else 0)
+        | (FLIP_TARGET_PILE if flip_target_pile else 0)
+    )
+    return [source_id, target_id, amount, flags, origin]
+
+def decode_flags(flags):
+    """Returns (flip_source_top, flip_source_pile, flip_target_top, flip_target_pile)."""
+    return (
+        bool(flags & FLIP_SOURCE_TOP),
+        bool(flags & FLIP_SOURCE_PILE),
+        bool(flags & FLIP_TARGET_TOP),
+        bool(flags & FLIP_TARGET_PILE),
+    )
+
+def skip_to_member(file, data) -> bytes:
+    """Returns data from the next gzip member header on, reading further as needed."""
+    while True:
+        start = data.find(GZIP_MAGIC)
+        if start >= 0:
+            return data[start:]
+
+        more = file.read(CHUNK_SIZE)
+        if not more:
+            return b""
+        # Keep the end in case a header is split between reads
+        data = data[-(len(GZIP_MAGIC) - 1):] + more
+
+def read_members(file) -> Iterator[bytes]:
+    """Yields the decompressed gzip members of a file one at a time. A damaged or
+    truncated member is yielded as None, and reading resumes at the next member."""
+    pending = file.read(CHUNK_SIZE)
+
+    while pending:
+        decompressor = zlib.decompressobj(wbits=31)
+        compressed = bytearray()
+        parts = []
+
+        try:
+            while not decompressor.eof:
+                if not pending:
+                    pending = file.read(CHUNK_SIZE)
+                    if not pending:
+                        raise EOFError
+                compressed += pending
+                parts.append(decompressor.decompress(pending))
+                pending = decompressor.unused_data
+        except EOFError:
+            yield None
+            return
+        except zlib.error:
+            yield None
+            pending = skip_to_member(file, bytes(compressed[1:]))
+            continue
+
+        yield b"".join(parts)
+
+def parse_games(lines) -> Iterator[dict]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Cut short or not UTF-8, json errors and decode errors are both ValueErrors
+            yield None
+
+def read_games(path) -> Iterator[dict]:
+    """Yields archived games one at a time, without loading the file. Games that can't
+    be read back, like the last one when the game was killed while writing, are
+    yielded as None."""
+    with open(path, "rb") as f:
+        if not path.endswith(".gz"):
+            yield from parse_games(f)
+            return
+
+        for member in read_members(f):
+            if member == None:
+                yield None
+            else:
+                yield from parse_games(member.splitlines())
+
+
+class ArchiveWriter:
+    """Appends finished games to an archive, one JSON line per game.
+
+    Every game is flushed as soon as it is written, see InputRecorder.begin_frame.
+    Compressed archives get one complete gzip member per game, so a damaged game
+    does not take the rest of the file with it."""
+
+    def __init__(self, path) -> None:
+        self.compress = path.endswith(".gz")
+        self.file = open(path, "ab")
+
+    def write_game(self, seed, outcome, events):
+        line = json.dumps({"seed": seed, "outcome": outcome, "events": events}, separators=(",", ":")) + "\n"
+        data = line.encode("utf-8")
+        self.file.write(gzip.compress(data) if self.compress else data)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,304 @@
+from base64 import b64encode
+from hashlib import sha1
+from threading import Thread
+import asyncio
+import struct
+
+from game.rules import PILE_IDS, Board, card_rank, card_suit
+
+
+# Deltas are a few bytes each. The high nibble of the first byte is the opcode.
+#   seed: 1 byte + 8 byte seed, starts a new game
+#   move: 1 byte (opcode, 4 flip flags) + 1 byte (source index, target index) + 1 byte amount
+#   undo: 1 byte
+OP_SEED = 1
+OP_MOVE = 2
+OP_UNDO = 3
+
+SEED = struct.Struct("<Q")
+MOVE = struct.Struct("<BBB")
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode_seed(seed) -> bytes:
+    return bytes([OP_SEED << 4]) + SEED.pack(seed % (1 << 64))
+
+def encode_move(source_id, target_id, amount, flip_source_top, flip_source_pile, flip_target_top, flip_target_pile) -> bytes:
+    flags = flip_source_top | flip_source_pile << 1 | flip_target_top << 2 | flip_target_pile << 3
+    piles = PILE_IDS.index(source_id) << 4 | PILE_IDS.index(target_id)
+    return MOVE.pack(OP_MOVE << 4 | flags, piles, amount)
+
+def encode_undo() -> bytes:
+    return bytes([OP_UNDO << 4])
+
+
+class DeltaDecoder:
+    """Splits a byte stream into deltas, keeping incomplete ones for the next feed."""
+
+    def __init__(self) -> None:
+        self.buffer = b""
+
+    def feed(self, data):
+        """Yields ("seed", seed), ("move", args) or ("undo", None) for every complete delta."""
+        self.buffer += data
+
+        while len(self.buffer) > 0:
+            op = self.buffer[0] >> 4
+
+            if op == OP_SEED:
+                if len(self.buffer) < 1 + SEED.size:
+                    return
+                seed, = SEED.unpack_from(self.buffer, 1)
+                self.buffer = self.buffer[1 + SEED.size:]
+                yield ("seed", seed)
+
+            elif op == OP_MOVE:
+                if len(self.buffer) < MOVE.size:
+                    return
+                head, piles, amount = MOVE.unpack_from(self.buffer)
+                self.buffer = self.buffer[MOVE.size:]
+                flips = tuple(bool(head & (1 << i)) for i in range(4))
+                yield ("move", (PILE_IDS[piles >> 4], PILE_IDS[piles & 0xF], amount, *flips))
+
+            elif op == OP_UNDO:
+                self.buffer = self.buffer[1:]
+                yield ("undo", None)
+
+            else:
+                raise ValueError(f"Unknown delta opcode {op}")
+
+
+class Client:
+    def __init__(self, queue_size, writer) -> None:
+        self.queue = asyncio.Queue(queue_size)
+        self.writer = writer
+        self.overflowed = False
+
+
+class BroadcastServer:
+    """Streams the current game to any number of TCP and WebSocket viewers.
+
+    The server runs its own asyncio loop on a background thread. publish() only hands
+    the delta to that loop, so the game never waits on the network. Every viewer has a
+    bounded queue drained by its own task; a viewer that falls a full queue behind is
+    disconnected instead of holding back the others. Viewers joining mid-game first
+    receive the seed and every delta of the current game."""
+
+    def __init__(self, host = "127.0.0.1", port = None, ws_port = None, queue_size = 256) -> None:
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.queue_size = queue_size
+
+        self.history = []
+        self.clients = set()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="broadcast", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.listen(), self.loop).result()
+
+    async def listen(self):
+        if self.port != None:
+            await asyncio.start_server(self.handle_tcp, self.host, self.port)
+        if self.ws_port != None:
+            await asyncio.start_server(self.handle_ws, self.host, self.ws_port)
+
+    def publish(self, delta:bytes):
+        """Sends a delta to every viewer. Safe to call from the game thread, never blocks."""
+        self.loop.call_soon_threadsafe(self.fan_out, delta)
+
+    def publish_seed(self, seed):
+        self.publish(encode_seed(seed))
+
+    def publish_move(self, *move):
+        self.publish(encode_move(*move))
+
+    def publish_undo(self):
+        self.publish(encode_undo())
+
+    def fan_out(self, delta):
+        if delta[0] >> 4 == OP_SEED:
+            self.history.clear()
+        self.history.append(delta)
+
+        for client in list(self.clients):
+            try:
+                client.queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Too slow to keep up, drop the viewer rather than buffer without limit.
+                # Its task is likely stuck in drain() on a peer that stopped reading, so abort the connection.
+                self.clients.discard(client)
+                client.overflowed = True
+                client.writer.transport.abort()
+
+    async def serve(self, reader, writer, send):
+        # Register and snapshot the history without awaiting in between, so no delta is missed
+        client = Client(self.queue_size, writer)
+        queue = client.queue
+        self.clients.add(client)
+        backlog = b"".join(self.history)
+
+        # The connection is closed when the viewer hangs up
+        closed = asyncio.ensure_future(self.wait_closed(reader))
+
+        try:
+            if len(backlog) > 0:
+                await send(backlog)
+
+            while not closed.done() and not client.overflowed:
+                get = asyncio.ensure_future(queue.get())
+                await asyncio.wait((get, closed), return_when=asyncio.FIRST_COMPLETED)
+                if not get.done():
+                    get.cancel()
+                    break
+
+                # Batch everything already queued into one write
+                delta = get.result()
+                while not queue.empty():
+                    delta += queue.get_nowait()
+
+                await send(delta)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(client)
+            closed.cancel()
+            writer.close()
+
+    async def wait_closed(self, reader):
+        try:
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+
+    async def handle_tcp(self, reader, writer):
+        async def send(data):
+            writer.write(data)
+            await writer.drain()
+
+        await self.serve(reader, writer, send)
+
+    async def handle_ws(self, reader, writer):
+        """Minimal WebSocket server: handshake, then every batch of deltas as one binary message."""
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+
+        key = None
+        for line in request.split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+
+        if key == None:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            writer.close()
+            return
+
+        accept = b64encode(sha1(key + WS_GUID).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+        async def send(data):
+            if len(data) < 126:
+                header = struct.pack("!BB", 0x82, len(data))
+            elif len(data) < 1 << 16:
+                header = struct.pack("!BBH", 0x82, 126, len(data))
+            else:
+                header = struct.pack("!BBQ", 0x82, 127, len(data))
+            writer.write(header + data)
+            await writer.drain()
+
+        await self.serve(reader, writer, send)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class BoardViewer:
+    """Headless viewer, rebuilds the board from the deltas."""
+
+    def __init__(self) -> None:
+        self.board = Board()
+        self.log = []
+        self.decoder = DeltaDecoder()
+
+    def apply(self, data):
+        """Applies every complete delta in data. Returns the number applied."""
+        applied = 0
+        for kind, value in self.decoder.feed(data):
+            if kind == "seed":
+                self.board.new_game(value)
+                self.log.clear()
+            elif kind == "move":
+                self.board.perform_move(*value)
+                self.log.append(value)
+            elif kind == "undo" and len(self.log) > 0:
+                self.board.undo_move(*self.log.pop())
+            applied += 1
+
+        return applied
+
+    def card_name(self, card):
+        if not self.board.face_up[card]:
+            return "##"
+        return "A23456789TJQK"[card_rank(card)] + "HDSC"[card_suit(card)]
+
+    def render(self) -> str:
+        piles = self.board.piles
+        top = lambda pile_id: self.card_name(piles[pile_id][-1]) if piles[pile_id] else "--"
+
+        lines = [
+            "[%2d] %s    %s" % (
+                len(piles["stock"]),
+                top("waste"),
+                " ".join(top(f"foundation{i}") for i in range(4))
+            )
+        ]
+
+        tableaus = [piles[f"tableau{i}"] for i in range(7)]
+        for row in range(max(len(t) for t in tableaus)):
+            lines.append(" ".join(self.card_name(t[row]) if row < len(t) else "  " for t in tableaus))
+
+        return "\n".join(lines)
+
+
+async def watch(host, port):
+    """Connects to a broadcasting game over TCP and prints the board after every update."""
+    reader, writer = await asyncio.open_connection(host, port)
+    viewer = BoardViewer()
+
+    while True:
+        data = await reader.read(4096)
+        if not data:
+            break
+
+        if viewer.apply(data) > 0:
+            print(viewer.render(), end="\n\n", flush=True)
+
+    writer.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Watch a game broadcast with --broadcast.")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    args = parser.parse_args()
+
+    asyncio.run(watch(args.host, args.port))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+from collections import deque
+from functools import lru_cache
+from math import log
+from typing import NamedTuple, Optional
+import logging
+import random
+
+from game.rules import card_rank, card_suit
+from game.solver import Solver, State, can_stack, deal
+
+
+LEVELS = ("easy", "medium", "hard")
+
+# Score boundaries between easy/medium and medium/hard, each splitting deals roughly in thirds
+THRESHOLDS = (0.36, 0.46)
+SLOW_THRESHOLDS = (0.52, 0.57)
+
+# Search nodes for the slow score, enough to solve most deals
+SOLVER_NODES = 5000
+
+# Deals the picker keeps ready for every level
+QUEUE_SIZE = 2
+
+
+class DealFeatures(NamedTuple):
+    """Cheap structural features of an opening position."""
+
+    # Cards stacked on top of aces in the tableau
+    buried_aces: int
+
+    # Face-down kings that are not at the bottom of their column
+    buried_kings: int
+
+    # Cards stacked on a lower card of the same suit in the same column
+    blocked_chains: int
+
+    # How late the stock deals the aces, twos and cards the tableau tops are waiting for, 0 to 1
+    stock_mismatch: float
+
+
+def features_of(state:State) -> DealFeatures:
+    buried_aces = 0
+    buried_kings = 0
+    blocked_chains = 0
+
+    for down, up in state.tableau:
+        column = down + up
+        for depth, card in enumerate(column):
+            above = column[depth + 1:]
+
+            if card_rank(card) == 0:
+                buried_aces += len(above)
+            if card_rank(card) == 12 and depth > 0 and depth < len(down):
+                buried_kings += 1
+
+            blocked_chains += sum(1 for other in above if card_suit(other) == card_suit(card) and card_rank(other) > card_rank(card))
+
+    # Draw order, first card dealt first
+    order = state.stock[::-1]
+    tops = [up[-1] for _, up in state.tableau if up]
+    needed = [card for card in order if card_rank(card) <= 1 or any(can_stack(card, top) for top in tops)]
+    stock_mismatch = 0.0
+    if len(needed) > 0 and len(order) > 1:
+        stock_mismatch = sum(order.index(card) for card in needed) / len(needed) / (len(order) - 1)
+
+    return DealFeatures(buried_aces, buried_kings, blocked_chains, stock_mismatch)
+
+def fast_score(features:DealFeatures) -> float:
+    """Difficulty from 0 (easy) to about 1 (hard), from the structural features alone."""
+    # Weights fitted against solver effort. Any card may fill an empty column in this
+    # game, so buried kings matter much less than in standard Klondike.
+    return (
+        0.03 * features.buried_aces
+        + 0.01 * features.buried_kings
+        + 0.02 * features.blocked_chains
+        + 0.3 * features.stock_mismatch
+    )
+
+
+@lru_cache(maxsize=4096)
+def deal_features(seed) -> DealFeatures:
+    return features_of(deal(seed))
+
+@lru_cache(maxsize=1024)
+def solver_score(seed, node_limit = SOLVER_NODES) -> float:
+    """Difficulty from 0 to 1 by how much of a bounded search the deal needs. Unsolved deals score 1."""
+    result = Solver(node_limit).solve(deal(seed))
+    if not result.is_win:
+        return 1.0
+    return min(1.0, log(result.nodes) / log(node_limit))
+
+def difficulty(seed, slow = False) -> float:
+    """Fast score, or the solver score alone. The fast score hardly predicts solver
+    effort (r = 0.18 over 300 random deals), averaging it in only blurs the levels."""
+    if slow:
+        return solver_score(seed)
+    return fast_score(deal_features(seed))
+
+def level_of(score, slow = False) -> str:
+    for level, threshold in zip(LEVELS, SLOW_THRESHOLDS if slow else THRESHOLDS):
+        if score < threshold:
+            return level
+    return LEVELS[-1]
+
+def pick_seed(level, source_seed, slow = False, attempts = 200):
+    """Returns a seed whose deal rates as level.
+
+    Candidates are drawn from source_seed, so the same source always picks the same deal.
+    Falls back to the closest candidate if none matches within the attempts."""
+    rng = random.Random(source_seed)
+    target = LEVELS.index(level)
+    best_seed = None
+    best_distance = None
+
+    for _ in range(attempts):
+        seed = rng.getrandbits(63)
+        distance = abs(LEVELS.index(level_of(difficulty(seed, slow), slow)) - target)
+        if distance == 0:
+            return seed
+
+        if best_distance == None or distance < best_distance:
+            best_seed = seed
+            best_distance = distance
+
+    return best_seed
+
+
+def run_picker(tasks, results):
+    """Picker process loop. Also ends when the game is gone, it may exit without closing the picker."""
+    from multiprocessing import parent_process
+    from queue import Empty
+
+    parent = parent_process()
+    while parent.is_alive():
+        try:
+            task = tasks.get(timeout=1)
+        except Empty:
+            continue
+
+        if task == None:
+            break
+
+        level, source_seed = task
+        results.put((level, pick_seed(level, source_seed, slow=True)))
+
+
+class DealPicker:
+    """Keeps a few deals of every level picked ahead, in a background process.
+
+    The slow score runs the solver and can take seconds, too long to wait for between
+    frames. The picker starts filling its queues as soon as it is created and refills a
+    level whenever a deal is taken, so take() never waits. It returns None when no deal
+    of the level is ready yet, and the caller asks again on a later frame.
+
+    The process is a daemon like the solver pool's, so exiting the game stops it rather
+    than waiting for the picks in progress."""
+
+    def __init__(self, queue_size = QUEUE_SIZE) -> None:
+        import multiprocessing
+
+        # Spawned rather than forked, the game already runs other threads
+        ctx = multiprocessing.get_context("spawn")
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(target=run_picker, args=(self.tasks, self.results), daemon=True)
+        self.process.start()
+
+        self.rng = random.Random()
+        self.ready = {level: deque() for level in LEVELS}
+
+        # One round of every level at a time, so each has a deal ready early
+        for _ in range(queue_size):
+            for level in LEVELS:
+                self.submit(level)
+
+    def submit(self, level):
+        self.tasks.put((level, self.rng.getrandbits(63)))
+
+    def collect(self):
+        """Moves finished picks into the ready queues without waiting."""
+        from queue import Empty
+
+        while True:
+            try:
+                level, seed = self.results.get_nowait()
+            except Empty:
+                return
+            self.ready[level].append(seed)
+
+    def take(self, level) -> Optional[int]:
+        """Returns the next picked deal of level, or None if it is not ready yet."""
+        self.collect()
+        if len(self.ready[level]) > 0:
+            self.submit(level)
+            return self.ready[level].popleft()
+
+        if self.process.is_alive():
+            return None
+
+        # Without the worker, fall back to the fast score, a rough guess but instant
+        logging.getLogger(__name__).error("Deal picker exited with code %s, picking a deal for %s by the fast score", self.process.exitcode, level)
+        return pick_seed(level, self.rng.getrandbits(63))
+
+    def close(self):
+        # Picks in progress are thrown away anyway
+        self.process.terminate()
@@ -0,0 +1,225 @@
+from collections import deque
+from time import time_ns
+import struct
+import pyxel
+
+
+MAGIC = b"MSIR"
+VERSION = 1
+
+# Header: magic, version, fps, number of tracked keys. Followed by one H per key code.
+HEADER = struct.Struct("<4sBHB")
+KEY_CODE = struct.Struct("<H")
+
+# Every record starts with a repeat count. A positive count is a run of identical frames,
+# a zero count is a seed drawn or picked by the game during the last recorded frame.
+COUNT = struct.Struct("<H")
+FRAME = struct.Struct("<Ihh")
+SEED = struct.Struct("<Q")
+
+MAX_RUN = 0xFFFF
+
+# Bit offsets of each state inside the frame mask, which leaves room for MAX_KEYS keys
+PRESSED = 0
+HELD = 10
+RELEASED = 20
+MAX_KEYS = HELD - PRESSED
+
+
+class Input:
+    """Per-frame snapshot of the tracked buttons and mouse position.
+
+    The game reads input through this class instead of pyxel, so a session can be
+    recorded and played back. Time is derived from the frame counter, which keeps
+    time-based input (double clicks) identical between live play and playback."""
+
+    def __init__(self, keys, fps) -> None:
+        self.keys = list(keys)
+        if len(self.keys) > MAX_KEYS:
+            # More keys would overlap the held and released bits, live and in recordings
+            raise ValueError(f"At most {MAX_KEYS} keys can be tracked, got {len(self.keys)}")
+        self.bits = {key: i for i, key in enumerate(self.keys)}
+        self.fps = fps
+        self.frame = 0
+
+        self.mask = 0
+        self.mouse_x = 0
+        self.mouse_y = 0
+
+    @property
+    def finished(self):
+        return False
+
+    def time(self) -> float:
+        """Virtual clock, in seconds since the first frame."""
+        return self.frame / self.fps
+
+    def seed(self) -> int:
+        """Returns a seed for a new game."""
+        return time_ns()
+
+    def picked_seed(self, seed):
+        """Passes on a seed picked in the background, None while it is not ready. When it
+        becomes ready differs between runs, so recordings keep the frame it arrived on."""
+        return seed
+
+    def begin_frame(self):
+        """Captures the input for the current frame. Called once at the start of every update."""
+        self.frame += 1
+        self.mask, self.mouse_x, self.mouse_y = self.poll()
+
+    def poll(self):
+        mask = 0
+        for i, key in enumerate(self.keys):
+            if pyxel.btnp(key):
+                mask |= 1 << (PRESSED + i)
+            if pyxel.btn(key):
+                mask |= 1 << (HELD + i)
+            if pyxel.btnr(key):
+                mask |= 1 << (RELEASED + i)
+
+        return (mask, pyxel.mouse_x, pyxel.mouse_y)
+
+    def check(self, key, offset) -> bool:
+        # Keys missing from older recordings are never pressed
+        bit = self.bits.get(key)
+        return bit != None and bool(self.mask & (1 << (offset + bit)))
+
+    def btnp(self, key) -> bool:
+        return self.check(key, PRESSED)
+
+    def btn(self, key) -> bool:
+        return self.check(key, HELD)
+
+    def btnr(self, key) -> bool:
+        return self.check(key, RELEASED)
+
+    def close(self):
+        pass
+
+
+class InputRecorder(Input):
+    """Live input that is also written to a compact log file."""
+
+    def __init__(self, keys, fps, path) -> None:
+        super().__init__(keys, fps)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, fps, len(self.keys)))
+        for key in self.keys:
+            self.file.write(KEY_CODE.pack(key))
+
+        # Identical consecutive frames are written as a single run
+        self.run = None
+        self.run_length = 0
+
+    def seed(self) -> int:
+        return self.write_seed(super().seed())
+
+    def picked_seed(self, seed):
+        if seed != None:
+            self.write_seed(seed)
+        return seed
+
+    def write_seed(self, seed):
+        # The seed belongs to the current frame, so the run must end here
+        self.write_run()
+        self.file.write(COUNT.pack(0) + SEED.pack(seed))
+        return seed
+
+    def begin_frame(self):
+        super().begin_frame()
+
+        state = (self.mask, self.mouse_x, self.mouse_y)
+        if state != self.run or self.run_length == MAX_RUN:
+            self.write_run()
+            self.run = state
+
+        self.run_length += 1
+
+        # pyxel may exit without running atexit handlers, so anything that has to survive
+        # the session is written out as it happens. Here, the file on disk is kept current
+        # to within a second, including the run still going on.
+        if self.frame % self.fps == 0:
+            self.write_run()
+            self.file.flush()
+
+    def write_run(self):
+        if self.run_length > 0:
+            self.file.write(COUNT.pack(self.run_length) + FRAME.pack(*self.run))
+            self.run_length = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        self.write_run()
+        self.file.close()
+
+
+class InputPlayback(Input):
+    """Replays a log written by InputRecorder, frame by frame."""
+
+    def __init__(self, path) -> None:
+        self.file = open(path, "rb")
+
+        magic, version, fps, key_count = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an input recording")
+
+        keys = [KEY_CODE.unpack(self.file.read(KEY_CODE.size))[0] for _ in range(key_count)]
+        super().__init__(keys, fps)
+
+        self.seeds = deque()
+        self.run = None
+        self.run_length = 0
+        self.read_record()
+
+    @property
+    def finished(self):
+        return self.run_length == 0 and self.next_run == None
+
+    def seed(self) -> int:
+        return self.seeds.popleft() if len(self.seeds) > 0 else super().seed()
+
+    def picked_seed(self, seed):
+        # Seeds are recorded after the run that ends on their frame, so only the last frame
+        # of a run can take one. The game polls for picked seeds after anything else that
+        # draws a seed during the frame.
+        if self.run_length == 0 and len(self.seeds) > 0:
+            return self.seeds.popleft()
+        return None
+
+    def read_record(self):
+        """Reads the next record into self.next_run, queueing any seeds found on the way."""
+        self.next_run = None
+
+        while True:
+            data = self.file.read(COUNT.size)
+            if len(data) < COUNT.size:
+                return
+
+            count, = COUNT.unpack(data)
+            if count == 0:
+                self.seeds.append(SEED.unpack(self.file.read(SEED.size))[0])
+            else:
+                self.next_run = (count, FRAME.unpack(self.file.read(FRAME.size)))
+                return
+
+    def begin_frame(self):
+        self.frame += 1
+
+        if self.run_length == 0:
+            if self.next_run == None:
+                # Recording is over, no more input
+                self.mask = 0
+                return
+
+            # Seeds recorded after this run are used during its frames, read them ahead
+            self.run_length, self.run = self.next_run
+            self.read_record()
+
+        self.run_length -= 1
+        self.mask, self.mouse_x, self.mouse_y = self.run
+
+    def close(self):
+        self.file.close()
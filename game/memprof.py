@@ -0,0 +1,147 @@
+from time import perf_counter
+import gc
+import os
+import sys
+import tracemalloc
+
+
+# Traceback depth kept by tracemalloc, deep enough to see the profiler under any allocation it makes
+TRACEBACK_FRAMES = 32
+
+
+class MemoryProfile:
+    """Opt-in allocation and garbage collector instrumentation for the frame loop.
+
+    Every frame is bracketed by begin_frame/end_frame. During the frame a profile hook
+    samples the number of allocated blocks on every call and return, and adds each
+    increase to the function that was running. Temporaries freed before the frame ends
+    are counted this way; blocks allocated and freed between two calls are not, so the
+    counts are a lower bound.
+
+    The traced peak gives the memory each frame churned through, and a tracemalloc
+    snapshot taken at start is compared against the end of the session to show which
+    lines kept memory. A gc callback times every collection and attributes it to the
+    current frame.
+
+    If a budget is set, idle frames (idle_check returns True at the end of the frame)
+    after the first warmup frames that allocate more than budget blocks are recorded
+    as violations."""
+
+    def __init__(self, budget = None, idle_check = None, warmup = 0, top = 10) -> None:
+        self.budget = budget
+        self.idle_check = idle_check
+        self.warmup = warmup
+        self.top = top
+
+        self.frame = 0
+        self.frames = 0
+        self.total_allocated = 0
+        self.total_retained = 0
+        self.peak_bytes = 0
+        self.functions = {}
+        self.violations = []
+
+        self.gc_pauses = []
+        self.gc_start = 0
+
+        self.snapshot = None
+        self.blocks = 0
+        self.frame_blocks = 0
+        self.allocated = 0
+
+    def start(self):
+        tracemalloc.start(TRACEBACK_FRAMES)
+        gc.callbacks.append(self.on_gc)
+        self.snapshot = self.take_snapshot()
+
+    def stop(self):
+        sys.setprofile(None)
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        tracemalloc.stop()
+
+    def take_snapshot(self):
+        # Ignore tracemalloc's allocations and anything the profiler allocated, at any depth
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__, all_frames=True),
+        ))
+
+    def on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_start = perf_counter()
+        else:
+            self.gc_pauses.append((self.frame, info["generation"], perf_counter() - self.gc_start))
+
+    def on_event(self, frame, event, arg):
+        """Profile hook, runs on every call and return during the frame."""
+        blocks = sys.getallocatedblocks()
+        if blocks > self.blocks:
+            # A call is reported before the callee runs, so the caller made the allocations
+            code = frame.f_back.f_code if event == "call" and frame.f_back else frame.f_code
+            if code.co_filename != __file__:
+                self.allocated += blocks - self.blocks
+                self.functions[code] = self.functions.get(code, 0) + blocks - self.blocks
+
+        # Sample again so the hook's own bookkeeping is not counted
+        self.blocks = sys.getallocatedblocks()
+
+    def begin_frame(self, frame):
+        self.frame = frame
+        self.allocated = 0
+        tracemalloc.reset_peak()
+        self.blocks = sys.getallocatedblocks()
+        self.frame_blocks = self.blocks
+        sys.setprofile(self.on_event)
+
+    def end_frame(self):
+        """Collects the allocations made since begin_frame."""
+        sys.setprofile(None)
+        allocated = self.allocated
+        retained = sys.getallocatedblocks() - self.frame_blocks
+        _, peak = tracemalloc.get_traced_memory()
+
+        self.frames += 1
+        self.total_allocated += allocated
+        self.total_retained += retained
+        self.peak_bytes = max(self.peak_bytes, peak)
+
+        if self.budget != None and self.frames > self.warmup and allocated > self.budget and self.idle_check and self.idle_check():
+            self.violations.append((self.frame, allocated))
+
+    @property
+    def passed(self) -> bool:
+        return len(self.violations) == 0
+
+    def report(self, final = True) -> str:
+        """Summarises the frames so far. Comparing snapshots takes a long time, so only the final report does it."""
+        frames = max(1, self.frames)
+        lines = [
+            f"Memory over {self.frames} frames:",
+            f"  blocks allocated per frame: {self.total_allocated / frames:.1f}",
+            f"  blocks retained per frame:  {self.total_retained / frames:.1f}",
+            f"  peak traced memory:         {self.peak_bytes / 1024:.1f} KiB",
+            "  Top allocating functions (blocks):",
+        ]
+
+        by_count = sorted(self.functions.items(), key=lambda item: item[1], reverse=True)
+        for code, count in by_count[:self.top]:
+            lines.append(f"    {count:8d}  {os.path.basename(code.co_filename)}:{code.co_name}")
+
+        if final and self.snapshot:
+            lines.append("  Lines holding the most new blocks (blocks, KiB):")
+            for stat in self.take_snapshot().compare_to(self.snapshot, "lineno")[:self.top]:
+                frame = stat.traceback[0]
+                lines.append(f"    {stat.count_diff:8d} {stat.size_diff / 1024:9.1f}  {os.path.basename(frame.filename)}:{frame.lineno}")
+
+        total_pause = sum(pause for _, _, pause in self.gc_pauses)
+        lines.append(f"  GC: {len(self.gc_pauses)} collections, {total_pause * 1000:.2f} ms total")
+        for frame, generation, pause in sorted(self.gc_pauses, key=lambda p: p[2], reverse=True)[:self.top]:
+            lines.append(f"    frame {frame:6d}: gen {generation} {pause * 1000:.3f} ms")
+
+        if self.budget != None:
+            lines.append(f"  Idle frame budget ({self.budget} blocks): {'passed' if self.passed else 'FAILED'}")
+            for frame, blocks in self.violations[:self.top]:
+                lines.append(f"    frame {frame:6d}: {blocks} blocks")
+
+        return "\n".join(lines)
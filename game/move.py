@@ -7,7 +7,8 @@ class Move:
         flip_source_top = False,
         flip_source_pile = False,
         flip_target_top = False,
-        flip_target_pile = False
+        flip_target_pile = False,
+        origin = "drag"
     ):
         self.source = source
         self.target = target
@@ -15,4 +16,7 @@ class Move:
         self.flip_source_top = flip_source_top
         self.flip_source_pile = flip_source_pile
         self.flip_target_top = flip_target_top
-        self.flip_target_pile = flip_target_pile
\ No newline at end of file
+        self.flip_target_pile = flip_target_pile
+
+        # How the player made the move: "drag", "click", "quick", "auto" or "stock"
+        self.origin = origin
\ No newline at end of file
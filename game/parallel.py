@@ -0,0 +1,297 @@
+from multiprocessing import shared_memory
+from queue import Empty
+from time import perf_counter
+import multiprocessing
+
+from game.solver import State, Solver, SolveResult, apply_move, canonical_key, deal, forced_move, legal_moves
+
+
+# Linear probes before giving up on deduplicating a position
+PROBES = 8
+
+# Nodes between checks for stop requests and idle workers
+CHECK_INTERVAL = 256
+
+
+def position_hash(state:State) -> int:
+    """Nonzero 64-bit hash of the canonical position. Tuples of ints hash the same in every process."""
+    return (hash(canonical_key(state)) & 0xFFFFFFFFFFFFFFFF) or 1
+
+
+class SharedTable:
+    """Set of position hashes in shared memory, open-addressed with linear probing.
+
+    Workers insert without locking. A lost race only means a position is searched twice,
+    and a crowded neighbourhood reports positions as new, so the search stays complete."""
+
+    def __init__(self, buffer) -> None:
+        self.keys = buffer.cast("Q")
+        self.mask = len(self.keys) - 1
+
+    def insert(self, key) -> bool:
+        """Adds key, returns False if it was already there."""
+        i = key & self.mask
+        for _ in range(PROBES):
+            current = self.keys[i]
+            if current == key:
+                return False
+            if current == 0:
+                self.keys[i] = key
+                return True
+            i = (i + 1) & self.mask
+
+        return True
+
+    def release(self):
+        self.keys.release()
+
+
+class Worker:
+    """Search loop run by every pool process."""
+
+    def __init__(self, table_name, tasks, results, stop, job, idle, pending, nodes, tablebase_path) -> None:
+        # Pool processes share the parent's resource tracker, which unlinks the block
+        self.shm = shared_memory.SharedMemory(table_name)
+        self.table = SharedTable(self.shm.buf)
+        self.tasks = tasks
+        self.results = results
+        self.stop = stop
+        self.job = job
+        self.idle = idle
+        self.pending = pending
+        self.nodes = nodes
+
+        self.endgames = None
+        if tablebase_path:
+            from game.tablebase import Tablebase
+            self.endgames = Solver(tablebase=Tablebase.open(tablebase_path))
+
+    def run(self):
+        while True:
+            with self.idle.get_lock():
+                self.idle.value += 1
+            task = self.tasks.get()
+            with self.idle.get_lock():
+                self.idle.value -= 1
+
+            if task == None:
+                break
+
+            job, state, prefix = task
+            try:
+                if job == self.job.value and not self.stop.is_set():
+                    self.search(job, state, prefix)
+            finally:
+                with self.pending.get_lock():
+                    self.pending.value -= 1
+
+        self.table.release()
+        self.shm.close()
+
+    def donate(self, job, stack, prefix):
+        """Hands the least promising move of the shallowest frame to an idle worker."""
+        for depth, (state, _, moves) in enumerate(stack):
+            if moves:
+                move = moves.pop(0)
+                path = prefix + [m for _, m, _ in stack[1:depth + 1]] + [move]
+                with self.pending.get_lock():
+                    self.pending.value += 1
+                self.tasks.put((job, apply_move(state, move), path))
+                return
+
+    def search(self, job, state, prefix):
+        """Depth-first search of one subtree, same as Solver.solve but sharing the table."""
+        if not self.table.insert(position_hash(state)):
+            return
+
+        stack = [(state, None, None)]
+        nodes = 0
+
+        try:
+            while stack:
+                current, move, moves = stack[-1]
+
+                if moves == None:
+                    nodes += 1
+                    if nodes % CHECK_INTERVAL == 0:
+                        with self.nodes.get_lock():
+                            self.nodes.value += CHECK_INTERVAL
+                        if self.stop.is_set():
+                            return
+                        if self.idle.value > 0:
+                            self.donate(job, stack, prefix)
+
+                    known = self.endgames.endgame(current) if self.endgames else None
+                    if current.is_won or known:
+                        line = prefix + [m for _, m, _ in stack[1:]]
+                        if not current.is_won:
+                            line += self.endgames.tablebase.winning_line(current)
+                        self.results.put((job, line))
+                        self.stop.set()
+                        return
+
+                    if known == False:
+                        moves = []
+                    else:
+                        moves = legal_moves(current)
+                        forced = forced_move(current, moves)
+                        if forced:
+                            moves = [forced]
+                        moves.reverse()
+                    stack[-1] = (current, move, moves)
+
+                if not moves:
+                    stack.pop()
+                    continue
+
+                # Most promising moves are at the end, donations come from the front
+                next_move = moves.pop()
+                child = apply_move(current, next_move)
+                if self.table.insert(position_hash(child)):
+                    stack.append((child, next_move, None))
+        finally:
+            with self.nodes.get_lock():
+                self.nodes.value += nodes % CHECK_INTERVAL
+
+def run_worker(*args):
+    Worker(*args).run()
+
+
+class ParallelSolver:
+    """Solves one deal on a pool of processes.
+
+    The root's moves are split into subtrees and queued. Workers search them depth-first
+    and share a transposition table in shared memory. Whenever a worker is idle, busy
+    workers hand over their shallowest unexplored move, so the work spreads out as the
+    search goes. The first worker to find a win stops the others.
+
+    Worker processes are started once and reused for every solve, so a check during play
+    only pays for the search."""
+
+    def __init__(self, workers = None, node_limit = 1000000, table_slots = 1 << 21, tablebase_path = None, context = None) -> None:
+        self.workers = workers or multiprocessing.cpu_count()
+        self.node_limit = node_limit
+        self.table_slots = table_slots
+        self.tablebase_path = tablebase_path
+        self.context = multiprocessing.get_context(context)
+        self.processes = []
+
+    def start(self):
+        if self.processes:
+            return
+
+        ctx = self.context
+        self.shm = shared_memory.SharedMemory(create=True, size=self.table_slots * 8)
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.stop = ctx.Event()
+        self.job = ctx.Value("i", 0)
+        self.idle = ctx.Value("i", 0)
+        self.pending = ctx.Value("i", 0)
+        self.nodes = ctx.Value("q", 0)
+
+        args = (self.shm.name, self.tasks, self.results, self.stop, self.job, self.idle, self.pending, self.nodes, self.tablebase_path)
+        self.processes = [ctx.Process(target=run_worker, args=args, daemon=True) for _ in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+    def solve(self, state:State, timeout = None) -> SolveResult:
+        """Searches a position. Returns "win" with its moves, "loss" if the whole tree was
+        searched, or "unknown" when the node limit or timeout was reached first."""
+        self.start()
+
+        if state.is_won:
+            return SolveResult("win", [], 0)
+
+        # Fresh table and counters for this job
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+        self.nodes.value = 0
+        self.stop.clear()
+        with self.job.get_lock():
+            self.job.value += 1
+            job = self.job.value
+
+        moves = legal_moves(state)
+        forced = forced_move(state, moves)
+        if forced:
+            moves = [forced]
+
+        with self.pending.get_lock():
+            self.pending.value += len(moves)
+        for move in moves:
+            self.tasks.put((job, apply_move(state, move), [move]))
+
+        status = "unknown"
+        line = []
+        deadline = perf_counter() + timeout if timeout else None
+
+        try:
+            while True:
+                try:
+                    result_job, result_line = self.results.get(timeout=0.005)
+                    if result_job == job:
+                        status = "win"
+                        line = result_line
+                        break
+                except Empty:
+                    pass
+
+                if self.pending.value == 0:
+                    # A winner sets stop before finishing its task, its result is still on the way
+                    if self.stop.is_set():
+                        continue
+                    status = "loss"
+                    break
+
+                if self.nodes.value > self.node_limit or (deadline and perf_counter() > deadline):
+                    break
+        finally:
+            # Stop every worker and let them drain the queue before the next job
+            self.stop.set()
+            while self.pending.value > 0:
+                try:
+                    self.results.get(timeout=0.005)
+                except Empty:
+                    pass
+
+        return SolveResult(status, line, self.nodes.value)
+
+    def close(self):
+        if not self.processes:
+            return
+
+        self.stop.set()
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+        self.processes = []
+        self.shm.close()
+        self.shm.unlink()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check whether deals can be won, searching on every core.")
+    parser.add_argument("seeds", type=int, nargs="+", help="deals to solve")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--node-limit", type=int, default=1000000, help="search nodes per deal across all workers (default: %(default)s)")
+    parser.add_argument("--tablebase", help="endgame tablebase to look positions up in")
+    args = parser.parse_args()
+
+    solver = ParallelSolver(args.workers, args.node_limit, tablebase_path=args.tablebase)
+    solver.start()
+    try:
+        for seed in args.seeds:
+            start = perf_counter()
+            result = solver.solve(deal(seed))
+            print(f"{seed}: {result.status} in {perf_counter() - start:.3f}s, {result.nodes} nodes, {len(result.moves)} moves")
+    finally:
+        solver.close()
+
+if __name__ == '__main__':
+    main()
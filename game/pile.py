@@ -62,14 +62,13 @@ class Pile:
         return self.cards[0] if len(self.cards) > 0 else None
 
     def position_cards(self, offset_x = None, offset_y = None, hand_size = 0, now = False):
-        pile_cards = []
-        hand_cards = []
-
         if hand_size > 0:
             pile_cards = self.cards[:-hand_size]
             hand_cards = self.cards[-hand_size:]
         else:
-            pile_cards = self.cards[:]
+            # Called for every pile every frame, avoid copying when nothing is in hand
+            pile_cards = self.cards
+            hand_cards = ()
 
         self.card_spacing = CARD_SPACING
 
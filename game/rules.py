@@ -0,0 +1,178 @@
+from typing import Dict, List
+import random
+
+from game.enums import Suit, Color
+
+
+# Same ids and order as App.piles
+TABLEAU_IDS = [f"tableau{i}" for i in range(7)]
+FOUNDATION_IDS = [f"foundation{i}" for i in range(4)]
+PILE_IDS = TABLEAU_IDS + ["stock", "waste"] + FOUNDATION_IDS
+
+
+def card_suit(card:int) -> int:
+    return card // 13
+
+def card_rank(card:int) -> int:
+    return card % 13
+
+def card_color(card:int) -> Color:
+    return Color.Red if card_suit(card) in (Suit.Hearts, Suit.Diamonds) else Color.Black
+
+
+class Board:
+    """Headless copy of the game rules, without pyxel.
+
+    Cards are ints numbered like App.cards (suit * 13 + rank), piles are lists with
+    the top card last. Dealing, validating, performing and undoing moves behave
+    exactly like App.new_game, App.validate_move, App.perform_move and App.undo_move,
+    so logged games can be replayed and searched outside the game."""
+
+    def __init__(self) -> None:
+        self.piles:Dict[str, List[int]] = {pile_id: [] for pile_id in PILE_IDS}
+        self.face_up = [False] * 52
+        self.seed = None
+
+    def new_game(self, seed):
+        """Shuffles and deals the opening position for a seed."""
+        self.seed = seed
+        for pile in self.piles.values():
+            pile.clear()
+        self.face_up = [False] * 52
+
+        # Same generator and card order as App.new_game, so seeds deal identical games
+        stock = self.piles["stock"]
+        stock.extend(range(52))
+        random.Random(seed).shuffle(stock)
+
+        # Deal one row at a time, each row one pile shorter
+        for row in range(7):
+            for pile_id in TABLEAU_IDS[row:]:
+                self.piles[pile_id].append(stock.pop())
+
+        for pile_id in TABLEAU_IDS:
+            self.face_up[self.piles[pile_id][-1]] = True
+
+    def top_card(self, pile_id):
+        pile = self.piles[pile_id]
+        return pile[-1] if len(pile) > 0 else None
+
+    @property
+    def is_won(self) -> bool:
+        return all(len(self.piles[pile_id]) == 13 for pile_id in FOUNDATION_IDS)
+
+    @property
+    def cards_down(self) -> int:
+        return self.face_up.count(False)
+
+    def flip_top(self, pile_id):
+        card = self.piles[pile_id][-1]
+        self.face_up[card] = not self.face_up[card]
+
+    def flip_pile(self, pile_id):
+        """Reverse pile and flip all cards."""
+        pile = self.piles[pile_id]
+        pile.reverse()
+        for card in pile:
+            self.face_up[card] = not self.face_up[card]
+
+    def draw(self, pile_id, amount) -> List[int]:
+        """Removes and returns cards from the top of a pile, like Pile.draw."""
+        pile = self.piles[pile_id]
+        amount = max(1, min(amount, len(pile)))
+        moving = pile[-amount:]
+        del pile[-amount:]
+        return moving
+
+    def validate_move(self, source_id, target_id, amount) -> bool:
+        """Same checks as App.validate_move."""
+        source = self.piles[source_id]
+        target = self.piles[target_id]
+
+        if amount <= 0 or source_id == target_id or len(source) == 0:
+            return False
+
+        if 'stock' in target_id or 'waste' in target_id:
+            return False
+
+        # The stock is only ever drawn by clicking it
+        if 'stock' in source_id:
+            return False
+
+        if ('waste' in source_id or 'foundation' in source_id) and amount > 1:
+            return False
+
+        if 'foundation' in target_id:
+            if amount > 1:
+                return False
+
+            card = source[-1]
+            if len(target) == 0:
+                return card_rank(card) == 0
+
+            top = target[-1]
+            return card_suit(card) == card_suit(top) and card_rank(card) == card_rank(top) + 1
+
+        if 'tableau' in target_id:
+            if len(target) == 0:
+                return True
+
+            card = source[-amount]
+            top = target[-1]
+            return card_color(top) != card_color(card) and card_rank(card) + 1 == card_rank(top)
+
+        return False
+
+    def perform_move(
+        self,
+        source_id,
+        target_id,
+        amount = None,
+        flip_source_top = False,
+        flip_source_pile = False,
+        flip_target_top = False,
+        flip_target_pile = False
+    ):
+        """Moves cards between piles, like App.perform_move without sound or logging."""
+        if amount == None:
+            amount = len(self.piles[source_id])
+        elif amount == 0:
+            return
+
+        self.piles[target_id].extend(self.draw(source_id, amount))
+
+        if len(self.piles[source_id]) > 0:
+            if flip_source_top:
+                self.flip_top(source_id)
+            if flip_source_pile:
+                self.flip_pile(source_id)
+
+        if flip_target_top:
+            self.flip_top(target_id)
+        if flip_target_pile:
+            self.flip_pile(target_id)
+
+    def undo_move(
+        self,
+        source_id,
+        target_id,
+        amount,
+        flip_source_top = False,
+        flip_source_pile = False,
+        flip_target_top = False,
+        flip_target_pile = False
+    ):
+        """Returns the board to the state before a move, like App.undo_move."""
+        if len(self.piles[target_id]) > 0:
+            if flip_target_top:
+                self.flip_top(target_id)
+            if flip_target_pile:
+                self.flip_pile(target_id)
+
+        if len(self.piles[source_id]) > 0:
+            if flip_source_top:
+                self.flip_top(source_id)
+            if flip_source_pile:
+                self.flip_pile(source_id)
+
+        self.piles[source_id].extend(self.draw(target_id, amount))
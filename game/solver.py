@@ -0,0 +1,348 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+from game.enums import Suit
+from game.rules import TABLEAU_IDS, FOUNDATION_IDS, Board, card_rank, card_suit
+
+
+# Piles are numbered 0-6 for the tableau, then stock, waste and one foundation per suit.
+# Foundations in the game accept any suit on an empty slot, so the solver only tracks
+# how many cards of each suit are up, and which slot holds them does not matter.
+#
+# Moves are (source, target, amount). Stock clicks are (STOCK, WASTE, 1) and recycling
+# is (WASTE, STOCK, n), but the search never plays them on their own: with one card
+# drawn at a time and unlimited redeals every stock and waste card can be reached, so
+# the search uses (STOCK, target, clicks), "click the stock this many times, then play
+# the waste top onto target". The game plays them as single clicks.
+STOCK = 7
+WASTE = 8
+FOUNDATION = 9
+
+Move = Tuple[int, int, int]
+
+
+class State(NamedTuple):
+    """Immutable position. Cards are ints like in game.rules, top card last."""
+    tableau: Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]
+    stock: Tuple[int, ...]
+    waste: Tuple[int, ...]
+    foundation: Tuple[int, ...]
+
+    @property
+    def remaining(self) -> int:
+        """Number of cards not on the foundations."""
+        return 52 - sum(self.foundation)
+
+    @property
+    def is_won(self) -> bool:
+        return self.remaining == 0
+
+
+def is_red(card):
+    return card_suit(card) in (Suit.Hearts, Suit.Diamonds)
+
+def can_stack(card, onto) -> bool:
+    """Tableau rule: alternating color, one rank lower."""
+    return is_red(card) != is_red(onto) and card_rank(card) + 1 == card_rank(onto)
+
+
+def state_from_board(board:Board) -> State:
+    tableau = []
+    for pile_id in TABLEAU_IDS:
+        pile = board.piles[pile_id]
+        split = next((i for i, card in enumerate(pile) if board.face_up[card]), len(pile))
+        tableau.append((tuple(pile[:split]), tuple(pile[split:])))
+
+    foundation = [0] * 4
+    for pile_id in FOUNDATION_IDS:
+        pile = board.piles[pile_id]
+        if len(pile) > 0:
+            foundation[card_suit(pile[0])] = len(pile)
+
+    return State(tuple(tableau), tuple(board.piles["stock"]), tuple(board.piles["waste"]), tuple(foundation))
+
+def deal(seed) -> State:
+    """Opening position for a seed, identical to the game's deal."""
+    board = Board()
+    board.new_game(seed)
+    return state_from_board(board)
+
+
+def talon(state:State) -> Tuple[int, ...]:
+    """Stock and waste as they would be right after recycling, in drawing order.
+    Positions that only differ by clicks on the stock share the same talon."""
+    return state.waste + state.stock[::-1]
+
+def canonical_key(state:State):
+    """Hashable key shared by positions that only differ in the order of the tableau
+    columns or by clicks on the stock."""
+    return (tuple(sorted(state.tableau)), talon(state), state.foundation)
+
+def canonical_bytes(state:State) -> bytes:
+    """Compact byte encoding of the canonical position, used for on-disk keys."""
+    data = bytearray()
+    for down, up in sorted(state.tableau):
+        data.extend(down)
+        data.append(0xFE)
+        data.extend(up)
+        data.append(0xFF)
+    data.extend(talon(state))
+    data.append(0xFF)
+    data.extend(state.foundation)
+    return bytes(data)
+
+
+def is_safe_to_found(state:State, card) -> bool:
+    """A card can go up for good once both opposite color cards one rank lower are up,
+    since nothing could ever need to be stacked on it."""
+    rank = card_rank(card)
+    if rank <= 1:
+        return True
+
+    opposite = (Suit.Spades, Suit.Clubs) if is_red(card) else (Suit.Hearts, Suit.Diamonds)
+    return all(state.foundation[suit] >= rank for suit in opposite)
+
+def talon_cards(state:State):
+    """Yields (clicks, card) for every card that can be brought to the waste top,
+    except the current top, in the order the stock would deal them."""
+    stock, waste = state.stock, state.waste
+    for clicks in range(1, len(stock) + 1):
+        yield clicks, stock[-clicks]
+
+    # After the stock runs out, one click recycles and the waste is dealt again from the bottom
+    for i in range(1, len(waste)):
+        yield len(stock) + 1 + i, waste[i - 1]
+
+def card_targets(state:State, card, empty_target):
+    """Yields every pile a single card from outside the tableau may go to."""
+    if state.foundation[card_suit(card)] == card_rank(card):
+        yield FOUNDATION + card_suit(card)
+
+    for j, (target_down, target_up) in enumerate(state.tableau):
+        if (not target_up and not target_down and j == empty_target) or (target_up and can_stack(card, target_up[-1])):
+            yield j
+
+def legal_moves(state:State) -> List[Move]:
+    """Every move App.validate_move accepts, most promising first. Stock draws are folded
+    into the move that plays the drawn card."""
+    foundation_moves = []
+    reveal_moves = []
+    other_moves = []
+
+    tableau = state.tableau
+
+    # To foundation, from tableau tops and the waste
+    for i, (down, up) in enumerate(tableau):
+        if up and state.foundation[card_suit(up[-1])] == card_rank(up[-1]):
+            foundation_moves.append((i, FOUNDATION + card_suit(up[-1]), 1))
+    if state.waste:
+        card = state.waste[-1]
+        if state.foundation[card_suit(card)] == card_rank(card):
+            foundation_moves.append((WASTE, FOUNDATION + card_suit(card), 1))
+
+    # Between tableau columns, any face-up run
+    empty_target = next((j for j, (down, up) in enumerate(tableau) if not down and not up), None)
+    for i, (down, up) in enumerate(tableau):
+        for k in range(len(up), 0, -1):
+            card = up[-k]
+            reveals = k == len(up) and len(down) > 0
+
+            for j, (target_down, target_up) in enumerate(tableau):
+                if j == i:
+                    continue
+
+                if not target_up and not target_down:
+                    # Only the first empty column, and never a whole column into an empty one
+                    if j != empty_target or (k == len(up) and not down):
+                        continue
+                elif not target_up or not can_stack(card, target_up[-1]):
+                    continue
+
+                (reveal_moves if reveals else other_moves).append((i, j, k))
+
+    # Waste top to tableau
+    if state.waste:
+        for j in card_targets(state, state.waste[-1], empty_target):
+            if j < FOUNDATION:
+                other_moves.append((WASTE, j, 1))
+
+    # Foundation back to tableau
+    for suit, count in enumerate(state.foundation):
+        if count == 0:
+            continue
+        card = suit * 13 + count - 1
+        for j in card_targets(state, card, empty_target):
+            if j < FOUNDATION:
+                other_moves.append((FOUNDATION + suit, j, 1))
+
+    # Any other stock or waste card, drawn and played
+    talon_moves = []
+    for clicks, card in talon_cards(state):
+        for j in card_targets(state, card, empty_target):
+            (foundation_moves if j >= FOUNDATION else talon_moves).append((STOCK, j, clicks))
+
+    return foundation_moves + reveal_moves + other_moves + talon_moves
+
+def click_stock(state:State, clicks) -> State:
+    """Returns the position after clicking the stock, recycling the waste when it runs out."""
+    stock, waste = state.stock, state.waste
+
+    if clicks <= len(stock):
+        return state._replace(stock=stock[:-clicks], waste=waste + stock[:-clicks - 1:-1])
+
+    dealt = talon(state)
+    drawn = clicks - len(stock) - 1
+    return state._replace(stock=dealt[drawn:][::-1], waste=dealt[:drawn])
+
+def apply_move(state:State, move:Move) -> State:
+    """Returns the position after a move. Face-down cards left on top are turned up, like the game does."""
+    source, target, amount = move
+    tableau = list(state.tableau)
+    stock = state.stock
+    waste = state.waste
+    foundation = state.foundation
+
+    # Take cards from the source
+    if source < STOCK:
+        down, up = tableau[source]
+        cards = up[-amount:]
+        up = up[:-amount]
+        if not up and down:
+            up = down[-1:]
+            down = down[:-1]
+        tableau[source] = (down, up)
+    elif source == STOCK:
+        if target != WASTE:
+            # Draw, then play the new waste top
+            return apply_move(click_stock(state, amount), (WASTE, target, 1))
+        cards = stock[-1:]
+        stock = stock[:-1]
+    elif source == WASTE:
+        if target == STOCK:
+            # Recycling flips the waste back over
+            return State(state.tableau, waste[::-1], (), foundation)
+        cards = waste[-1:]
+        waste = waste[:-1]
+    else:
+        suit = source - FOUNDATION
+        cards = (suit * 13 + foundation[suit] - 1,)
+        foundation = foundation[:suit] + (foundation[suit] - 1,) + foundation[suit + 1:]
+
+    # Put them on the target
+    if target < STOCK:
+        down, up = tableau[target]
+        tableau[target] = (down, up + cards)
+    elif target == WASTE:
+        waste = waste + cards
+    else:
+        suit = target - FOUNDATION
+        foundation = foundation[:suit] + (foundation[suit] + 1,) + foundation[suit + 1:]
+
+    return State(tuple(tableau), stock, waste, foundation)
+
+def moved_card(state:State, move:Move) -> int:
+    """Returns the bottom card a move picks up."""
+    source, target, amount = move
+    if source < STOCK:
+        return state.tableau[source][1][-amount]
+    if source == STOCK:
+        return click_stock(state, amount).waste[-1] if target != WASTE else state.stock[-1]
+    if source == WASTE:
+        return state.waste[-1]
+    return (source - FOUNDATION) * 13 + state.foundation[source - FOUNDATION] - 1
+
+def forced_move(state:State, moves:List[Move]) -> Optional[Move]:
+    """Returns a move from moves that can never hurt to play immediately, if any."""
+    for move in moves:
+        if move[1] >= FOUNDATION and is_safe_to_found(state, moved_card(state, move)):
+            return move
+
+    return None
+
+
+class SolveResult(NamedTuple):
+    status: str
+    moves: List[Move]
+    nodes: int
+
+    @property
+    def is_win(self) -> bool:
+        return self.status == "win"
+
+
+class Solver:
+    """Depth-first search with a transposition table.
+
+    With a tablebase, endgames with few enough cards left to turn up are answered by a
+    lookup instead of being searched. With harvest=True, the search adds what it learns
+    to the tablebase, which is how tablebases are built: the endgames on the winning line
+    it finds, or every endgame it visited once it has searched everything without a win."""
+
+    def __init__(self, node_limit = 200000, tablebase = None, harvest = False) -> None:
+        self.node_limit = node_limit
+        self.tablebase = tablebase
+        self.harvest = harvest
+
+    def endgame(self, state:State) -> Optional[bool]:
+        """Returns True/False for positions the tablebase knows, None otherwise."""
+        if self.tablebase == None:
+            return None
+
+        distance = self.tablebase.lookup(state)
+        if distance == None:
+            return None
+        return distance != self.tablebase.UNWINNABLE
+
+    def solve(self, state:State) -> SolveResult:
+        seen = set()
+        nodes = 0
+
+        # Endgames visited, all lost if the search runs out of moves
+        endgames = []
+
+        # Each frame is (position, move that led to it, remaining moves to try)
+        stack = [(state, None, None)]
+
+        while stack:
+            current, move, moves = stack[-1]
+
+            if moves == None:
+                nodes += 1
+                if nodes > self.node_limit:
+                    return SolveResult("unknown", [], nodes)
+
+                known = self.endgame(current)
+                if current.is_won or known:
+                    line = [m for _, m, _ in stack[1:]]
+                    if not current.is_won:
+                        line += self.tablebase.winning_line(current)
+                    if self.harvest:
+                        self.tablebase.add_line(state, line)
+                    return SolveResult("win", line, nodes)
+
+                # Known lost endgames have nothing to search
+                if known == False:
+                    moves = []
+                else:
+                    if self.harvest and self.tablebase.covers(current):
+                        endgames.append(current)
+                    moves = legal_moves(current)
+                    forced = forced_move(current, moves)
+                    if forced:
+                        moves = [forced]
+                    moves.reverse()
+                stack[-1] = (current, move, moves)
+
+            if not moves:
+                stack.pop()
+                continue
+
+            next_move = moves.pop()
+            child = apply_move(current, next_move)
+            key = canonical_key(child)
+            if key not in seen:
+                seen.add(key)
+                stack.append((child, next_move, None))
+
+        for endgame in endgames:
+            self.tablebase.store(endgame, self.tablebase.UNWINNABLE)
+        return SolveResult("loss", [], nodes)
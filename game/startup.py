@@ -0,0 +1,26 @@
+from time import perf_counter
+
+
+class StartupProfile:
+    """Measures how long each startup phase takes, from process start to the first interactive frame."""
+
+    def __init__(self, start_time) -> None:
+        self.start_time = start_time
+        self.last_time = start_time
+        self.phases = []
+
+    def mark(self, name):
+        """Ends the current phase. Phases already marked are ignored."""
+        if any(phase == name for phase, _ in self.phases):
+            return
+
+        now = perf_counter()
+        self.phases.append((name, now - self.last_time))
+        self.last_time = now
+
+    def report(self) -> str:
+        lines = ["Startup time:"]
+        for name, duration in self.phases:
+            lines.append(f"  {name:<12} {duration * 1000:8.1f} ms")
+        lines.append(f"  {'total':<12} {(self.last_time - self.start_time) * 1000:8.1f} ms")
+        return "\n".join(lines)
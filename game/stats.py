@@ -0,0 +1,244 @@
+from queue import Empty, Queue
+from threading import Event, Thread
+import logging
+import sqlite3
+import time
+
+
+DEFAULT_PATH = "stats.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    seed INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    move_count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    undo_count INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seed_stats (
+    seed INTEGER PRIMARY KEY,
+    plays INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total_moves INTEGER NOT NULL,
+    total_undos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    current_streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0, 0);
+"""
+
+
+class GameRecord:
+    def __init__(self, seed, outcome, move_count, duration, undo_count, finished_at = None):
+        self.seed = seed
+        self.outcome = outcome
+        self.move_count = move_count
+        self.duration = duration
+        self.undo_count = undo_count
+        self.finished_at = time.time() if finished_at == None else finished_at
+
+    @property
+    def is_win(self):
+        return self.outcome == "win"
+
+
+class StatsStore:
+    """Records finished games into SQLite.
+
+    Writes are queued and committed by a background thread, so recording a game
+    never blocks the frame loop. Games arrive minutes apart, so each one is committed
+    as soon as the queue is empty, together with anything queued behind it. Aggregates (totals, streaks,
+    per-seed counters) are kept up to date in the same transaction as the
+    inserts, so queries read a single row instead of scanning the games table."""
+
+    def __init__(self, path = DEFAULT_PATH, batch_size = 32) -> None:
+        self.path = path
+        self.batch_size = batch_size
+
+        self.queue = Queue()
+        self.stopped = Event()
+
+        # Set by the writer thread once the schema exists or opening the database failed, readers wait for it
+        self.ready = Event()
+        self.error = None
+        self.reader = None
+
+        # Connecting and creating the schema happen on the writer thread, so this returns immediately
+        self.writer = Thread(target=self.write_loop, name="stats-writer", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, seed, outcome, move_count, duration, undo_count):
+        """Queues a finished game. Returns immediately."""
+        self.queue.put(GameRecord(seed, outcome, move_count, duration, undo_count))
+
+    def flush(self):
+        """Blocks until every queued game has been written."""
+        self.queue.join()
+        self.check_open()
+
+    def check_open(self):
+        if self.error != None:
+            raise RuntimeError(f"Statistics database {self.path} could not be opened") from self.error
+
+    def close(self):
+        """Writes pending games and stops the writer thread."""
+        if self.stopped.is_set():
+            return
+
+        self.stopped.set()
+        self.writer.join()
+        if self.reader:
+            self.reader.close()
+
+    def read(self, sql, args = ()):
+        """Runs a query, opening the reader connection on first use."""
+        if self.reader == None:
+            self.ready.wait()
+            self.check_open()
+            self.reader = self.connect()
+        return self.reader.execute(sql, args)
+
+    def write_loop(self):
+        conn = None
+        try:
+            conn = self.connect()
+            conn.executescript(SCHEMA)
+        except Exception as e:
+            logging.getLogger(__name__).exception("Failed to open the statistics database %s", self.path)
+            self.error = e
+        finally:
+            self.ready.set()
+
+        while not (self.stopped.is_set() and self.queue.empty()):
+            batch = []
+
+            # Wait for the first record, then take whatever is already queued behind it
+            try:
+                batch.append(self.queue.get(timeout=0.1))
+            except Empty:
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            try:
+                # Without a database, games are dropped so flush() still returns
+                if self.error == None:
+                    self.write_batch(conn, batch)
+            except Exception:
+                # Keep the writer alive, a dead writer would leave flush() waiting forever
+                logging.getLogger(__name__).exception("Failed to write %d games", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+        if conn != None:
+            conn.close()
+
+    def write_batch(self, conn, batch):
+        """Inserts a batch of games and updates aggregates in a single transaction."""
+        with conn:
+            games, wins, streak, best = conn.execute(
+                "SELECT games, wins, current_streak, best_streak FROM totals WHERE id = 0"
+            ).fetchone()
+
+            for r in batch:
+                games += 1
+                if r.is_win:
+                    wins += 1
+                    streak += 1
+                    best = max(best, streak)
+                else:
+                    streak = 0
+
+            conn.executemany(
+                "INSERT INTO games (seed, outcome, move_count, duration, undo_count, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r.seed, r.outcome, r.move_count, r.duration, r.undo_count, r.finished_at) for r in batch]
+            )
+            conn.executemany(
+                """INSERT INTO seed_stats (seed, plays, wins, total_moves, total_undos) VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT(seed) DO UPDATE SET
+                    plays = plays + 1,
+                    wins = wins + excluded.wins,
+                    total_moves = total_moves + excluded.total_moves,
+                    total_undos = total_undos + excluded.total_undos""",
+                [(r.seed, int(r.is_win), r.move_count, r.undo_count) for r in batch]
+            )
+            conn.execute(
+                "UPDATE totals SET games = ?, wins = ?, current_streak = ?, best_streak = ? WHERE id = 0",
+                (games, wins, streak, best)
+            )
+
+    def win_rate(self) -> float:
+        """Returns the fraction of recorded games that were won."""
+        games, wins = self.read("SELECT games, wins FROM totals WHERE id = 0").fetchone()
+        return wins / games if games > 0 else 0.0
+
+    def streaks(self):
+        """Returns a (current, best) tuple of consecutive wins."""
+        return self.read("SELECT current_streak, best_streak FROM totals WHERE id = 0").fetchone()
+
+    def seed_difficulty(self, seed):
+        """Returns the loss rate for a seed (0.0 always won, 1.0 never won), or None if it was never played."""
+        row = self.read("SELECT plays, wins FROM seed_stats WHERE seed = ?", (seed,)).fetchone()
+        if row == None:
+            return None
+
+        plays, wins = row
+        return 1.0 - wins / plays
+
+    def hardest_seeds(self, limit = 10, min_plays = 1):
+        """Returns (seed, plays, wins) for the seeds with the lowest win ratio."""
+        return self.read(
+            """SELECT seed, plays, wins FROM seed_stats WHERE plays >= ?
+            ORDER BY CAST(wins AS REAL) / plays ASC, plays DESC LIMIT ?""",
+            (min_plays, limit)
+        ).fetchall()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show statistics of finished games.")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="statistics database (default: %(default)s)")
+    parser.add_argument("--hardest", type=int, default=10, metavar="N", help="number of hardest seeds to list (default: %(default)s)")
+    parser.add_argument("--min-plays", type=int, default=1, help="only list seeds played at least this often (default: %(default)s)")
+    parser.add_argument("--seed", type=int, action="append", default=[], help="show the loss rate of a seed, may be repeated")
+    args = parser.parse_args()
+
+    store = StatsStore(args.path)
+    try:
+        current, best = store.streaks()
+        print(f"Win rate: {store.win_rate():.1%}")
+        print(f"Streak: {current} (best {best})")
+
+        hardest = store.hardest_seeds(args.hardest, args.min_plays)
+        if hardest:
+            print("Hardest seeds (seed, plays, wins):")
+            for seed, plays, wins in hardest:
+                print(f"  {seed:20d} {plays:5d} {wins:5d}")
+
+        for seed in args.seed:
+            loss_rate = store.seed_difficulty(seed)
+            print(f"Seed {seed}: " + ("never played" if loss_rate == None else f"lost {loss_rate:.0%} of plays"))
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+from hashlib import blake2b
+from typing import List, Optional
+import mmap
+import struct
+
+from game.solver import State, Move, Solver, apply_move, canonical_bytes, deal, legal_moves
+
+
+MAGIC = b"MSTB"
+VERSION = 2
+
+# Header: magic, version, largest endgame phase stored, number of slots.
+# Slots: 64-bit position key (0 marks an empty slot) and moves to win.
+HEADER = struct.Struct("<4sIIQ")
+SLOT = struct.Struct("<QB")
+
+UNWINNABLE = 255
+MAX_DISTANCE = 254
+
+
+def endgame_phase(state:State) -> int:
+    """Face-down tableau cards plus stock and waste cards. It never grows during a game,
+    so every position after an endgame is one too."""
+    return sum(len(down) for down, _ in state.tableau) + len(state.stock) + len(state.waste)
+
+def position_key(state:State) -> int:
+    """64-bit hash of the canonical position. Never 0, which marks empty slots."""
+    key = int.from_bytes(blake2b(canonical_bytes(state), digest_size=8).digest(), "little")
+    return key or 1
+
+
+class Tablebase:
+    """Endgame database: moves to win for positions with few face-down cards and a short
+    stock, up to max_phase (see endgame_phase).
+
+    The stored count is the length of the shortest winning line found so far. Every
+    position on that line is stored too, so winning_line can always step to a child
+    stored with a smaller count.
+
+    On disk the table is open-addressed with linear probing and memory-mapped, so a
+    lookup reads a slot or two without loading the file. Positions added since loading
+    are kept in memory until save()."""
+
+    UNWINNABLE = UNWINNABLE
+
+    def __init__(self, max_phase) -> None:
+        self.max_phase = max_phase
+        self.added = {}
+
+        self.file = None
+        self.map = None
+        self.slots = 0
+
+    @classmethod
+    def open(cls, path) -> "Tablebase":
+        with open(path, "rb") as f:
+            magic, version, max_phase, slots = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an endgame tablebase")
+
+        tablebase = cls(max_phase)
+        tablebase.file = open(path, "rb")
+        tablebase.map = mmap.mmap(tablebase.file.fileno(), 0, access=mmap.ACCESS_READ)
+        tablebase.slots = slots
+        return tablebase
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.entries())
+
+    def entries(self):
+        """Yields every (key, distance) pair, on disk and added."""
+        for i in range(self.slots):
+            key, distance = SLOT.unpack_from(self.map, HEADER.size + i * SLOT.size)
+            if key != 0 and key not in self.added:
+                yield key, distance
+        yield from self.added.items()
+
+    def lookup_key(self, key) -> Optional[int]:
+        if key in self.added:
+            return self.added[key]
+
+        if self.slots == 0:
+            return None
+
+        # Slot count is a power of two
+        i = key & (self.slots - 1)
+        while True:
+            slot_key, distance = SLOT.unpack_from(self.map, HEADER.size + i * SLOT.size)
+            if slot_key == key:
+                return distance
+            if slot_key == 0:
+                return None
+            i = (i + 1) & (self.slots - 1)
+
+    def covers(self, state:State) -> bool:
+        return endgame_phase(state) <= self.max_phase
+
+    def lookup(self, state:State) -> Optional[int]:
+        """Returns the moves to win (UNWINNABLE if lost), or None for unknown positions."""
+        if not self.covers(state):
+            return None
+        return self.lookup_key(position_key(state))
+
+    def store(self, state:State, distance):
+        """Keeps the shorter of the stored and the new distance."""
+        key = position_key(state)
+        current = self.lookup_key(key)
+        if current == None or distance < current:
+            self.added[key] = distance
+
+    def add_line(self, state:State, moves:List[Move]):
+        """Stores every endgame on a winning line, with the moves left from each. Once the
+        line reaches an endgame, the rest of it is stored too, since the phase never grows."""
+        distance = len(moves)
+        for move in [None] + moves:
+            if move:
+                state = apply_move(state, move)
+                distance -= 1
+            if distance <= MAX_DISTANCE and self.covers(state):
+                self.store(state, distance)
+
+    def winning_line(self, state:State) -> List[Move]:
+        """Returns the moves of the stored win for a winnable position in the table."""
+        moves = []
+        distance = self.lookup(state)
+        if distance in (None, UNWINNABLE):
+            raise ValueError("position is not a known win")
+
+        while not state.is_won:
+            for move in legal_moves(state):
+                child = apply_move(state, move)
+                child_distance = 0 if child.is_won else self.lookup(child)
+                if child_distance != None and child_distance < distance:
+                    moves.append(move)
+                    state = child
+                    distance = child_distance
+                    break
+            else:
+                raise RuntimeError(f"tablebase has no stored move from a position {distance} moves from winning")
+
+        return moves
+
+    def save(self, path):
+        """Writes every position to a new table file at half load."""
+        entries = dict(self.entries())
+        slots = 1
+        while slots < max(1, len(entries)) * 2:
+            slots *= 2
+
+        table = bytearray(HEADER.size + slots * SLOT.size)
+        HEADER.pack_into(table, 0, MAGIC, VERSION, self.max_phase, slots)
+        for key, distance in entries.items():
+            i = key & (slots - 1)
+            while SLOT.unpack_from(table, HEADER.size + i * SLOT.size)[0] != 0:
+                i = (i + 1) & (slots - 1)
+            SLOT.pack_into(table, HEADER.size + i * SLOT.size, key, distance)
+
+        self.close()
+        with open(path, "wb") as f:
+            f.write(table)
+
+    def close(self):
+        if self.map != None:
+            self.map.close()
+            self.file.close()
+            self.map = None
+            self.file = None
+            self.slots = 0
+
+
+def build(path, seeds, max_phase = 24, node_limit = 200000, base = None):
+    """Harvests endgames from solver runs over many deals and writes them to path."""
+    tablebase = Tablebase.open(base) if base else Tablebase(max_phase)
+    solver = Solver(node_limit, tablebase, harvest=True)
+
+    for seed in seeds:
+        solver.solve(deal(seed))
+
+    tablebase.save(path)
+    return tablebase
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build an endgame tablebase from solver runs.")
+    parser.add_argument("path", help="tablebase file to write")
+    parser.add_argument("--seeds", type=int, default=1000, help="number of deals to solve, seeds 0 to N-1 (default: %(default)s)")
+    parser.add_argument("--max-phase", type=int, default=24, help="largest number of face-down, stock and waste cards to store (default: %(default)s)")
+    parser.add_argument("--node-limit", type=int, default=200000, help="search nodes per deal (default: %(default)s)")
+    parser.add_argument("--base", help="existing tablebase to extend")
+    args = parser.parse_args()
+
+    tablebase = build(args.path, range(args.seeds), args.max_phase, args.node_limit, args.base)
+    print(f"{len(tablebase.added)} positions added")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import pyxel
+
+
+# Transparent color for text blocks without a background
+COLKEY = 14
+
+
+class CachedText:
+    """Drop-shadowed text pre-rendered into an off-screen image.
+
+    The text is only redrawn when it changes; every frame it is drawn with a single
+    blt instead of two pyxel.text calls per line."""
+
+    def __init__(self, width, height, fg = pyxel.COLOR_WHITE, bg = pyxel.COLOR_BLACK, fill = None, padding = 0) -> None:
+        self.width = width
+        self.height = height
+        self.fg = fg
+        self.bg = bg
+        self.fill = fill
+        self.padding = padding
+
+        self.image = pyxel.Image(width, height)
+        self.text = None
+
+    def set(self, s):
+        """Re-renders the block if the text changed."""
+        if s == self.text:
+            return
+
+        self.text = s
+        self.image.cls(COLKEY if self.fill == None else self.fill)
+        self.image.text(self.padding, self.padding + 1, s, self.bg)
+        self.image.text(self.padding, self.padding, s, self.fg)
+
+    def render(self, x, y):
+        if self.fill == None:
+            pyxel.blt(x, y, self.image, 0, 0, self.width, self.height, COLKEY)
+        else:
+            pyxel.blt(x, y, self.image, 0, 0, self.width, self.height)
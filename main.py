@@ -1,10 +1,17 @@
-from time import perf_counter, time_ns
+from time import perf_counter
+START_TIME = perf_counter()
+
+import atexit
+import gc
 import random
 import pyxel
 
 from game.card import Card
 from game.pile import Pile
 from game.move import Move
+from game.input import Input, InputPlayback, InputRecorder
+from game.startup import StartupProfile
+from game.text import CachedText
 from game.consts import CARD_HEIGHT, CARD_SPACING, CARD_WIDTH
 
 
@@ -13,22 +20,73 @@ Buttons = {
     'new': pyxel.KEY_N,
     'help': pyxel.KEY_H,
     'mode_switch': pyxel.KEY_TAB,
+    'difficulty': pyxel.KEY_D,
+    'solve': pyxel.KEY_S,
     'select': pyxel.MOUSE_BUTTON_LEFT,
     'cancel': pyxel.MOUSE_BUTTON_RIGHT,
+    'quick_move': pyxel.KEY_SHIFT,
 }
 
+FPS = 60
+
+# The D key cycles through these, None deals any seed
+DIFFICULTIES = [None, "easy", "medium", "hard"]
+
+# The winnability check gives up after this many seconds, and after the nodes its
+# workers search in that time at about 3000 nodes per second each
+SOLVE_SECONDS = 5
+SOLVE_NODES_PER_SECOND = 3000
+
+HELP = """Game Rules:
+-Goal: move all cards to the 
+4 Foundations (upper-right)
+as ordered cards of the same
+suit, in ascending rank
+(A, 2-10, J, Q, K).
+-Place cards in the seven
+Tableau Columns (bottom) in 
+descending rank (K, Q, J, 
+10-2, A), alternating color.
+-Get more cards from the
+Stock and Waste (upper-left).
+
+Controls:
+-Left-click: move cards.
+-Right-click: undo move.
+-N: new game. R: retry game.
+-D: difficulty. S: solvable?
+-Tab: Toggle drag-n-drop.
+"""
+
 
 class App:
-    def __init__(self) -> None:
+    def __init__(self, record = None, replay = None, unthrottled = False, fast_start = False, profile_startup = False, profile_memory = False, idle_budget = None, archive = None, broadcast = None, difficulty = None) -> None:
+        self.startup_profile = StartupProfile(START_TIME) if profile_startup else None
+        self.mark_startup("import")
+
         width = 128 # 160
         height = 128 # 144
-        pyxel.init(width, height, title="Solitaire", fps= 60)
+        pyxel.init(width, height, title="Solitaire", fps= FPS)
+        self.mark_startup("init")
+
         pyxel.load("assets/assets.pyxres")
+        self.mark_startup("assets")
 
         pyxel.mouse(True)
 
+        # Text that rarely changes is rendered once and blitted every frame
+        self.help_text = CachedText(120, 120, fill= pyxel.COLOR_NAVY, padding= 4)
+        self.help_text.set(HELP)
+        self.status_text = CachedText(width - 2, 7)
+        self.status = None
+
         self.config = {
-            "drag_and_drop": True
+            "drag_and_drop": True,
+            "animate_deal": not fast_start,
+            # Replayed sessions are not new games, keep them out of the statistics
+            "record_stats": not replay,
+            # None deals any seed, otherwise "easy", "medium" or "hard"
+            "difficulty": difficulty,
         }
 
         self.rng_seed = None
@@ -37,6 +95,8 @@ class App:
         self.move_count = 0
         self.game_status = "new"
         self.move_log = []
+        self.undo_count = 0
+        self.start_time = 0
         self.last_click_time = 0
 
         self.next_move = Move()
@@ -45,6 +105,47 @@ class App:
 
         self.show_help = False
 
+        # Input source: live, live and recorded, or played back from a recording
+        if replay:
+            self.input = InputPlayback(replay)
+        elif record:
+            self.input = InputRecorder(Buttons.values(), FPS, record)
+        else:
+            self.input = Input(Buttons.values(), FPS)
+        atexit.register(self.input.close)
+
+        # Opened on the first finished game, keeps SQLite out of startup
+        self.stats = None
+
+        # Keeps deals of every difficulty picked ahead in a background process from the
+        # start, so N and D rarely have to wait. Replays deal the recorded picks instead.
+        self.deals = None
+        if not replay:
+            from game.difficulty import DealPicker
+            self.deals = DealPicker()
+            atexit.register(self.deals.close)
+
+        # Every move and undo of the current game, written to the archive when the game ends
+        self.archive = None
+        self.events = []
+        if archive:
+            from game.archive import ArchiveWriter
+            self.archive = ArchiveWriter(archive)
+            atexit.register(self.archive.close)
+
+        # Worker pool for "is this deal winnable?" checks, started on the first check
+        self.solver = None
+        self.solving = False
+        self.solve_result = None
+
+        # Spectator server, streams the seed and every move to viewers
+        self.broadcast = None
+        if broadcast:
+            from game.broadcast import BroadcastServer
+            self.broadcast = BroadcastServer(**broadcast)
+            self.broadcast.start()
+            atexit.register(self.broadcast.close)
+
         self.cards = [Card(i // 13, i % 13) for i in range(52)]
 
         self.piles = {
@@ -66,14 +167,68 @@ class App:
         for key in self.piles.keys():
             self.piles[key].id = key
 
+        # Pile groups, built once instead of filtering the piles every frame
+        self.tableaus = [p for p in self.piles.values() if 'tableau' in p.id]
+        self.foundations = [p for p in self.piles.values() if 'foundation' in p.id]
+
         self.new_game()
-        pyxel.run(self.update, self.render)
+        self.mark_startup("setup")
+
+        # Cards, piles and the loaded modules live for the whole session, keep them out of GC passes
+        gc.freeze()
+
+        self.memory_profile = None
+        self.unthrottled = unthrottled
+        if profile_memory or idle_budget != None:
+            from game.memprof import MemoryProfile
+
+            # The first second fills caches like the status line, the budget applies after it
+            self.memory_profile = MemoryProfile(idle_budget, idle_check= self.is_idle, warmup= FPS)
+            self.memory_profile.start()
+            atexit.register(self.report_memory)
+
+        if unthrottled:
+            self.run_unthrottled()
+        else:
+            pyxel.run(self.update, self.render)
+
+    def run_unthrottled(self):
+        """Plays back the recorded input as fast as possible and reports frame timings."""
+        frame_times = []
+
+        start = perf_counter()
+        while not self.input.finished:
+            frame_start = perf_counter()
+            self.update()
+            self.render()
+            frame_times.append((perf_counter() - frame_start, self.input.frame))
+        total = perf_counter() - start
+
+        frames = len(frame_times)
+        print(f"{frames} frames in {total:.3f}s ({frames / total if total > 0 else 0:.1f} frames/s)")
+        print("Slowest frames:")
+        for duration, frame in sorted(frame_times, reverse=True)[:10]:
+            print(f"  frame {frame:6d}: {duration * 1000:.3f} ms")
+
+        self.report_memory()
+
+    def report_memory(self):
+        """Prints the memory profile, once."""
+        if self.memory_profile and self.memory_profile.frames > 0:
+            print(self.memory_profile.report())
+            self.memory_profile.stop()
+            self.memory_profile.frames = 0
+
+    def mark_startup(self, phase):
+        """Records the end of a startup phase when profiling startup."""
+        if self.startup_profile:
+            self.startup_profile.mark(phase)
 
     def get_cursor_pos(self):
-        return (pyxel.mouse_x, pyxel.mouse_y)
+        return (self.input.mouse_x, self.input.mouse_y)
     
     def get_offset_cursor(self):
-        return (pyxel.mouse_x - self.offset_x, pyxel.mouse_y - self.offset_y)
+        return (self.input.mouse_x - self.offset_x, self.input.mouse_y - self.offset_y)
 
     def set_cursor_offset(self, x, y):
         self.offset_x = x
@@ -81,7 +236,11 @@ class App:
 
     def new_game(self, seed = None):
         """Resets game state and starts a new game."""
-        
+
+        # Abandoning a game in progress counts as a loss, unless no move was made yet
+        if self.game_status == "play" and self.move_count > 0:
+            self.record_game("loss")
+
         # Set all cards face down, clears assigned pile
         for card in self.cards:
             card.set_face_down()
@@ -92,14 +251,31 @@ class App:
             pile.clear()
 
         # Resets state
-        self.rng_seed = time_ns() if seed == None else seed
-            
-        random.seed(self.rng_seed)
         self.game_status = "new"
         self.move_log.clear()
+        self.events = []
         self.reset_move()
 
         self.move_count = 0
+        self.undo_count = 0
+
+        if seed == None and self.config["difficulty"]:
+            # update deals it as soon as the picker has one ready, usually this frame
+            self.game_status = "picking"
+            return
+        elif seed == None:
+            seed = self.input.seed()
+
+        self.deal_game(seed)
+
+    def deal_game(self, seed):
+        """Shuffles the deal of seed into the stock and starts dealing it."""
+        self.rng_seed = seed
+            
+        random.seed(self.rng_seed)
+
+        if self.broadcast:
+            self.broadcast.publish_seed(self.rng_seed)
 
         # Assign cards to stock pile and shuffle
         stock = self.piles["stock"]
@@ -107,6 +283,38 @@ class App:
         stock.shuffle()
         stock.position_cards(now = True)
 
+        if not self.config["animate_deal"]:
+            self.deal_now()
+
+    def take_deal(self):
+        """Returns a deal of the chosen difficulty if the picker has one ready, else None.
+
+        When a pick is ready differs between runs, so it goes through the input like
+        other seeds and replays deal it on the same frame."""
+        ready = self.deals.take(self.config["difficulty"]) if self.deals else None
+        return self.input.picked_seed(ready)
+
+    def deal_now(self):
+        """Lays out the opening position without the deal animation."""
+        stock = self.piles["stock"]
+        tableaus = self.tableaus
+
+        # Same order as the animated deal: one row at a time, each row one pile shorter
+        for row in range(7):
+            for pile in tableaus[row:]:
+                pile.add(stock.draw(1))
+
+        for pile in tableaus:
+            pile.top_card.flip()
+            pile.position_cards(now = True)
+
+        self.start_game()
+
+    def start_game(self):
+        """Hands control to the player once the opening position is laid out."""
+        self.game_status = "play"
+        self.start_time = perf_counter()
+
     def win_game(self, force = False):
         """Wins game and sets appropiate game state."""
 
@@ -125,7 +333,69 @@ class App:
             return
 
         self.game_status = "win"
-        
+        self.record_game("win")
+
+    def record_game(self, outcome):
+        """Queues the current game's result in the statistics store and archive."""
+        if not self.config["record_stats"]:
+            return
+
+        if self.archive:
+            self.archive.write_game(self.rng_seed, outcome, self.events)
+
+        if not self.stats:
+            from game.stats import StatsStore
+            self.stats = StatsStore()
+            atexit.register(self.stats.close)
+
+        self.stats.record(
+            self.rng_seed,
+            outcome,
+            self.move_count,
+            perf_counter() - self.start_time,
+            self.undo_count
+        )
+
+    def solve_key(self):
+        """Identifies the current position, so stale solver answers are not shown."""
+        return (self.rng_seed, self.move_count, self.undo_count)
+
+    def check_winnable(self):
+        """Searches the current position on the solver pool in the background."""
+        from threading import Thread
+        import logging
+        from game.rules import Board
+        from game.solver import state_from_board
+
+        if not self.solver:
+            from game.parallel import ParallelSolver
+            import multiprocessing
+            # One core is left to the game. Spawned rather than forked, the game already
+            # runs the SDL and stats threads
+            workers = max(1, multiprocessing.cpu_count() - 1)
+            self.solver = ParallelSolver(workers, node_limit= workers * SOLVE_SECONDS * SOLVE_NODES_PER_SECOND, context= "spawn")
+            atexit.register(self.solver.close)
+
+        board = Board()
+        for pile_id, pile in self.piles.items():
+            board.piles[pile_id] = [card.suit * 13 + card.rank for card in pile.cards]
+        board.face_up = [card.is_face_up for card in self.cards]
+
+        state = state_from_board(board)
+        key = self.solve_key()
+
+        def run():
+            try:
+                self.solve_result = (key, self.solver.solve(state, timeout= SOLVE_SECONDS).status)
+            except Exception:
+                logging.getLogger(__name__).exception("Solver check failed")
+                self.solve_result = (key, "error")
+            finally:
+                self.solving = False
+
+        self.solving = True
+        Thread(target=run, name="solver", daemon=True).start()
+
     def get_pile_at(self, x, y) -> Pile:
         """Returns pile at the indicated (x, y) coordinates."""
         for pile in self.piles.values():
@@ -163,15 +433,22 @@ class App:
         else:
             return 1
 
+    def any_card_moving(self) -> bool:
+        """Returns True if any card is moving, without building a list."""
+        return any(c.is_moving() for c in self.cards)
+
+    def any_card_down(self) -> bool:
+        """Returns True if any card is face-down, without building a list."""
+        return any(not c.is_face_up for c in self.cards)
+
     def get_cards_moving(self):
         """Returns a list of cards currently moving."""
         cards = [c for c in self.cards if c.is_moving() == True]
         return cards
 
-    def get_cards_down(self):
-        """Returns a list of cards currently face-down."""
-        cards = [c for c in self.cards if not c.is_face_up]
-        return cards
+    def is_idle(self) -> bool:
+        """No input, nothing held and nothing moving. Idle frames should allocate next to nothing."""
+        return self.input.mask == 0 and self.next_move.source == None and not self.any_card_moving()
 
     def config_move(
         self,
@@ -182,7 +459,8 @@ class App:
         flip_source_pile:bool = None,
         flip_target_top:bool = None,
         flip_target_pile:bool = None,
-        log_move: bool = None
+        log_move: bool = None,
+        origin: str = None
     ):
         """Configure next move."""
         if source != None:
@@ -209,6 +487,9 @@ class App:
         if log_move != None:
             self.log_next_move = log_move
 
+        if origin != None:
+            self.next_move.origin = origin
+
     def validate_move(self, source:Pile, target:Pile, amount:int) -> bool:
         """Validate moves performed by dragging cards. Not used when undoing moves or clicking the Stock pile.
         Returns a boolean value indicating the attempted move is valid."""
@@ -281,7 +562,8 @@ class App:
         flip_source_pile = False,
         flip_target_top = False,
         flip_target_pile = False,
-        log_move = True
+        log_move = True,
+        origin = "drag"
     ):
         """Executes movevement of cards between piles."""
         
@@ -322,7 +604,8 @@ class App:
                 flip_source_top,
                 flip_source_pile,
                 flip_target_top,
-                flip_target_pile
+                flip_target_pile,
+                origin
             )
 
     def log_move(
@@ -334,6 +617,7 @@ class App:
         flip_source_pile = False,
         flip_target_top = False,
         flip_target_pile = False,
+        origin = "drag"
     ):
         """Records move to facilitate undoing. Also increases move counter."""
 
@@ -345,10 +629,35 @@ class App:
                 flip_source_top,
                 flip_source_pile,
                 flip_target_top,
-                flip_target_pile
+                flip_target_pile,
+                origin
             )
         )
 
+        if self.archive:
+            from game.archive import encode_move
+            self.events.append(encode_move(
+                source.id,
+                target.id,
+                amount,
+                flip_source_top,
+                flip_source_pile,
+                flip_target_top,
+                flip_target_pile,
+                origin
+            ))
+
+        if self.broadcast:
+            self.broadcast.publish_move(
+                source.id,
+                target.id,
+                amount,
+                flip_source_top,
+                flip_source_pile,
+                flip_target_top,
+                flip_target_pile
+            )
+
         self.move_count += 1
         
     def undo_move(self, move:Move):
@@ -384,13 +693,14 @@ class App:
         self.next_move.flip_source_top = False
         self.next_move.flip_target_pile = False
         self.next_move.flip_target_top = False
+        self.next_move.origin = "drag"
 
-    def try_quick_move(self, pile, card:Card):
+    def try_quick_move(self, pile, card:Card, origin = "quick"):
         """Attempts to perform a quick move and returns True if the move can be performed."""
         if not card or not card.is_face_up:
             return False
 
-        f_piles = [f for f in self.piles.values() if 'foundation' in f.id]
+        f_piles = self.foundations
 
         if card.rank == 0:
             f_piles = list(filter(lambda f: f.is_empty, f_piles))
@@ -400,7 +710,7 @@ class App:
         if len(f_piles) > 0:
             amount = self.get_card_amount(card)
             if amount > 0:
-                self.config_move(pile, f_piles[0], amount, log_move= True)
+                self.config_move(pile, f_piles[0], amount, log_move= True, origin= origin)
                 return True
         
         return False
@@ -416,9 +726,9 @@ class App:
         if 'stock' in pile.id and self.next_move.source == None:
             waste = self.piles["waste"]
             if pile.is_empty and not waste.is_empty:
-                self.perform_move(waste, pile, len(waste), flip_target_pile=True)
+                self.perform_move(waste, pile, len(waste), flip_target_pile=True, origin="stock")
             elif not pile.is_empty:
-                self.perform_move(pile, waste, 1, flip_target_top= True)
+                self.perform_move(pile, waste, 1, flip_target_top= True, origin="stock")
             return
         elif pile.is_empty and self.next_move.amount == 0:
             return
@@ -430,7 +740,7 @@ class App:
         elif self.next_move.source == None:
             self.set_cursor_offset(x - card.x, y - card.y)
             amount = self.get_card_amount(card) if 'tableau' in pile.id else 1
-            self.config_move(source= pile, amount= amount)
+            self.config_move(source= pile, amount= amount, origin= "drag" if self.config["drag_and_drop"] else "click")
 
         elif self.next_move.target == None:
             self.config_move(target= pile)
@@ -440,25 +750,35 @@ class App:
 
         for p in piles:
             if p.top_card:
-                if self.try_quick_move(p, p.top_card):
+                if self.try_quick_move(p, p.top_card, origin= "auto"):
                     return
 
     def handle_input(self):
         # New game
-        if pyxel.btnp(Buttons['new']):
+        if self.input.btnp(Buttons['new']):
             self.new_game()
 
         # Retry
-        elif pyxel.btnp(Buttons['retry']):
+        elif self.input.btnp(Buttons['retry']):
             self.new_game(self.rng_seed)
 
-        elif pyxel.btnp(Buttons['help']):
+        elif self.input.btnp(Buttons['help']):
             self.show_help = not self.show_help
 
         # Mode switch
-        elif pyxel.btnp(Buttons['mode_switch']):
+        elif self.input.btnp(Buttons['mode_switch']):
             self.config['drag_and_drop'] = not self.config['drag_and_drop']
 
+        # Cycle deal difficulty and deal a new game at it
+        elif self.input.btnp(Buttons['difficulty']):
+            self.config['difficulty'] = DIFFICULTIES[(DIFFICULTIES.index(self.config['difficulty']) + 1) % len(DIFFICULTIES)]
+            self.new_game()
+
+        # Ask the solver whether the current position can still be won
+        elif self.input.btnp(Buttons['solve']):
+            if self.game_status == "play" and not self.solving:
+                self.check_winnable()
+
         #elif pyxel.btnp(pyxel.KEY_W):
             #self.win_game(True)
 
@@ -468,16 +788,18 @@ class App:
 
 
     def update(self):
+        self.input.begin_frame()
+        if self.memory_profile:
+            self.memory_profile.begin_frame(self.input.frame)
+
         self.handle_input()
 
         if self.game_status == "new":
 
-            f_piles = [p for p in self.piles.values() if 'tableau' in p.id]
+            f_piles = self.tableaus
             lowest_height = len(self.piles['tableau6'])
 
-            moving = self.get_cards_moving()
-
-            if len(moving) == 0:
+            if not self.any_card_moving():
                 if lowest_height < 7:
                     for i in range(lowest_height, 7):
                         self.perform_move(self.piles["stock"], f_piles[i], 1, log_move= False)                  
@@ -489,34 +811,35 @@ class App:
                             f.top_card.flip()
                             return
 
-                    self.game_status = "play"
+                    self.start_game()
 
         elif self.game_status == "play":
-            moving = self.get_cards_moving()
-
             # Left Mouse draws and places, right mouse cancels and undoes
-            if pyxel.btnp(pyxel.MOUSE_BUTTON_LEFT):
-                click_time = perf_counter()
-                self.on_click(*self.get_cursor_pos(), pyxel.btn(pyxel.KEY_SHIFT) or click_time - self.last_click_time < 0.5)
+            if self.input.btnp(Buttons['select']):
+                click_time = self.input.time()
+                self.on_click(*self.get_cursor_pos(), self.input.btn(Buttons['quick_move']) or click_time - self.last_click_time < 0.5)
                 self.last_click_time = click_time
 
-            elif pyxel.btnp(pyxel.MOUSE_BUTTON_RIGHT):
+            elif self.input.btnp(Buttons['cancel']):
                 # If no move configured, undo last move 
                 if not self.next_move.source:
                     last_move = None if len(self.move_log) == 0 else self.move_log.pop()
                     if last_move != None:
                         self.undo_move(last_move)
+                        self.undo_count += 1
+                        if self.archive:
+                            from game.archive import UNDO
+                            self.events.append([UNDO])
+                        if self.broadcast:
+                            self.broadcast.publish_undo()
 
                 # Otherwise, reset move
                 else:
                     self.reset_move()
 
-            if pyxel.btnr(pyxel.MOUSE_BUTTON_LEFT):
-                map(lambda p: p.position_cards(), self.piles.values())
-
             # Release
             if self.config["drag_and_drop"]:
-                if pyxel.btnr(pyxel.MOUSE_BUTTON_LEFT) and self.next_move.source != None:
+                if self.input.btnr(Buttons['select']) and self.next_move.source != None:
                     
                     source_card = self.next_move.source.cards[-self.next_move.amount]
                     self.next_move.target = self.get_pile_at(*source_card.center)
@@ -531,15 +854,14 @@ class App:
                         else:
                             self.reset_move()
 
-            if len(self.get_cards_moving()) == 0:
+            if not self.any_card_moving():
                 
                 #win condition
-                f_piles = [p for p in self.piles.values() if 'foundation' in p.id and len(p) == 13]
-                if len(f_piles) == 4:
+                if all(len(f) == 13 for f in self.foundations):
                     self.win_game()
 
                 # Autoplay
-                elif len(self.get_cards_down()) == 0:
+                elif not self.any_card_down():
                     self.try_autoplay()
 
             # Process move if any
@@ -550,7 +872,7 @@ class App:
                 # Perform move if valid
                 is_valid = self.validate_move(m.source, m.target, m.amount)
                 if is_valid:
-                    self.perform_move(m.source, m.target, m.amount, m.flip_source_top, m.flip_source_pile, m.flip_target_top, m.flip_target_pile)
+                    self.perform_move(m.source, m.target, m.amount, m.flip_source_top, m.flip_source_pile, m.flip_target_top, m.flip_target_pile, origin= m.origin)
 
                 self.reset_move()
 
@@ -558,6 +880,12 @@ class App:
             if self.next_move.source and self.next_move.amount > 0:
                 self.next_move.source.position_cards(*self.get_offset_cursor(), self.next_move.amount, now = True)
 
+        # Polled after input, so a pick follows any seed drawn this frame, see InputPlayback.picked_seed
+        elif self.game_status == "picking":
+            seed = self.take_deal()
+            if seed != None:
+                self.deal_game(seed)
+
         elif self.game_status == "win":
             pass
 
@@ -611,36 +939,87 @@ class App:
             else:
                 self.next_move.source.render()
 
-        s = "Moves: %3i     [H] Help" % self.move_count
-        self.drop_text(2, pyxel.height - 7, s, 7)
+        # The solver's answer replaces the difficulty until the position changes
+        label = self.config["difficulty"].capitalize() if self.config["difficulty"] else ""
+        if self.solving or self.game_status == "picking":
+            label = "..."
+        elif self.solve_result and self.solve_result[0] == self.solve_key():
+            label = {"win": "Win", "loss": "No win", "error": "Error"}.get(self.solve_result[1], "?")
+
+        # Only re-render the status line when what it shows changes
+        status = (self.move_count, label)
+        if status != self.status:
+            self.status = status
+            if label:
+                self.status_text.set("Moves: %3i %6s [H] Help" % (self.move_count, label))
+            else:
+                self.status_text.set("Moves: %3i     [H] Help" % self.move_count)
+        self.status_text.render(2, pyxel.height - 7)
 
         if self.show_help:
-            pyxel.rect(4, 4, 120, 120, pyxel.COLOR_NAVY)
+            self.help_text.render(4, 4)
 
-            s = """Game Rules:
--Goal: move all cards to the 
-4 Foundations (upper-right)
-as ordered cards of the same
-suit, in ascending rank
-(A, 2-10, J, Q, K).
--Place cards in the seven
-Tableau Columns (bottom) in 
-descending rank (K, Q, J, 
-10-2, A), alternating color.
--Get more cards from the
-Stock and Waste (upper-left).
+        if self.startup_profile:
+            self.mark_startup("first frame")
+            if self.game_status == "play":
+                self.mark_startup("interactive")
+                print(self.startup_profile.report())
+                self.startup_profile = None
 
-Controls:
--Left-click: move cards.
--Right-click: undo move.
--N: new game.
--R: retry current game.
--Tab: Toggle drag-n-drop.
-"""
-            self.drop_text(8, 8, s)
+        if self.memory_profile:
+            self.memory_profile.end_frame()
+
+            # Live sessions also report every 10 seconds, see InputRecorder.begin_frame
+            if not self.unthrottled and self.memory_profile.frames % (FPS * 10) == 0:
+                print(self.memory_profile.report(final= False), flush=True)
 
 def main():
-    App()
+    # Only needed when launched from the command line
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Klondike solitaire made with Pyxel.")
+    parser.add_argument("--record", metavar="PATH", help="record every frame's input to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back input recorded with --record")
+    parser.add_argument("--unthrottled", action="store_true", help="with --replay, run as fast as possible and report frame timings")
+    parser.add_argument("--fast-start", action="store_true", help="skip the deal animation (always on in mini-solitaire.pyxapp)")
+    parser.add_argument("--difficulty", choices=["easy", "medium", "hard"], help="only deal games of this difficulty")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each startup phase takes")
+    parser.add_argument("--archive", metavar="PATH", help="append every finished game's moves to PATH (gzip if it ends in .gz)")
+    parser.add_argument("--broadcast", type=int, metavar="PORT", help="stream the game to TCP viewers on PORT (watch with python -m game.broadcast HOST PORT)")
+    parser.add_argument("--broadcast-ws", type=int, metavar="PORT", help="stream the game to WebSocket viewers on PORT")
+    parser.add_argument("--broadcast-host", default="127.0.0.1", metavar="HOST", help="address to stream on (default: %(default)s)")
+    parser.add_argument("--profile-memory", action="store_true", help="print allocations per function and GC pauses every 10 seconds and on exit")
+    parser.add_argument("--idle-budget", type=int, metavar="N", help="fail if an idle frame allocates more than N blocks (implies --profile-memory)")
+    # pyxel play runs a packaged app with pyxel's own arguments and packs the startup
+    # script marker next to this file. The packaged app is what kiosks launch, so it
+    # takes no options and always starts without the deal animation.
+    packaged = os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pyxapp_startup_script"))
+    args = parser.parse_args([] if packaged else None)
+
+    if args.unthrottled and not args.replay:
+        parser.error("--unthrottled requires --replay")
+
+    app = App(
+        record=args.record,
+        replay=args.replay,
+        unthrottled=args.unthrottled,
+        fast_start=args.fast_start or packaged,
+        profile_startup=args.profile_startup,
+        profile_memory=args.profile_memory,
+        idle_budget=args.idle_budget,
+        archive=args.archive,
+        difficulty=args.difficulty,
+        broadcast=None if args.broadcast == None and args.broadcast_ws == None else {
+            "host": args.broadcast_host,
+            "port": args.broadcast,
+            "ws_port": args.broadcast_ws,
+        }
+    )
+
+    # Only reached after an unthrottled replay
+    if app.memory_profile and not app.memory_profile.passed:
+        raise SystemExit(1)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file